@@ -0,0 +1,169 @@
+from data_models import *
+
+#################################################################
+# Tier Alignment
+# Myers' O((N+M)D) diff of the ordered label sequences of two tiers,
+# near-linear when the submission differs from the answer by a few edits
+#################################################################
+
+EQUAL = "equal"
+INSERT = "insert"
+DELETE = "delete"
+SUBSTITUTE = "substitute"
+MAX_EDITS = 2000 # beyond this many insertions and deletions, the tiers are too different to be worth aligning
+
+def tier_label_names(tier):
+    """
+    @return: the label names of the tier in time order, i.e. the text of an interval, the part before "=" of a point
+    """
+    if tier.classid == INTERVALTIER:
+        return [l[2] for l in tier.tier_labels]
+    return [l[1].split("=")[0].strip() for l in tier.tier_labels]
+
+def tier_label_spans(tier):
+    """
+    @return: the (start, end) time of every label of the tier, a point spans no time
+    """
+    if tier.classid == INTERVALTIER:
+        return [(l[0], l[1]) for l in tier.tier_labels]
+    return [(l[0], l[0]) for l in tier.tier_labels]
+
+def _myers_trace(a, b, max_edits):
+    """
+    The forward pass of Myers' algorithm
+    @return: the furthest x reached on every diagonal k = x - y, one dictionary per number of edits d,
+             or None if more than max_edits edits are needed
+    """
+    n, m = len(a), len(b)
+    v = {1: 0}
+    trace = []
+    for d in range(min(n + m, max_edits) + 1):
+        current = {}
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[k - 1] < v[k + 1]):
+                x = v[k + 1] # down: insert b[y]
+            else:
+                x = v[k - 1] + 1 # right: delete a[x]
+            y = x - k
+            while x < n and y < m and a[x] == b[y]: # follow the snake of equal labels
+                x += 1
+                y += 1
+            current[k] = x
+            if x >= n and y >= m:
+                trace.append(current)
+                return trace
+        trace.append(current)
+        v = current
+    return None
+
+def diff_sequences(a, b, max_edits=MAX_EDITS):
+    """
+    The shortest edit script from a to b, with only insertions and deletions
+    @return: the list of (op, index in a, index in b) in order, op is EQUAL, INSERT (index in a is the position before
+             which b[j] is inserted) or DELETE (index in b likewise); None if more than max_edits edits are needed
+    """
+    trace = _myers_trace(a, b, max_edits)
+    if trace == None:
+        return None
+    script = []
+    x, y = len(a), len(b)
+    for d in range(len(trace) - 1, 0, -1):
+        v = trace[d - 1]
+        k = x - y
+        if k == -d or (k != d and v[k - 1] < v[k + 1]):
+            prev_k = k + 1
+        else:
+            prev_k = k - 1
+        prev_x = v[prev_k]
+        prev_y = prev_x - prev_k
+        while x > prev_x and y > prev_y:
+            x -= 1
+            y -= 1
+            script.append((EQUAL, x, y))
+        if x == prev_x:
+            script.append((INSERT, x, prev_y))
+        else:
+            script.append((DELETE, prev_x, y))
+        x, y = prev_x, prev_y
+    while x > 0 and y > 0:
+        x -= 1
+        y -= 1
+        script.append((EQUAL, x, y))
+    script.reverse()
+    return script
+
+def _pair_substitutions(script):
+    """
+    Pairs the deletions and insertions between the same two equal labels into substitutions
+    @return: the list of (op, index in a or None, index in b or None), without the EQUAL ops
+    """
+    edits = []
+    deleted, inserted = [], []
+    for op, i, j in script + [(EQUAL, None, None)]:
+        if op == DELETE:
+            deleted.append(i)
+        elif op == INSERT:
+            inserted.append(j)
+        else:
+            paired = min(len(deleted), len(inserted))
+            edits.extend((SUBSTITUTE, deleted[p], inserted[p]) for p in range(paired))
+            edits.extend((DELETE, i_deleted, None) for i_deleted in deleted[paired:])
+            edits.extend((INSERT, None, j_inserted) for j_inserted in inserted[paired:])
+            deleted, inserted = [], []
+    return edits
+
+
+class TierEdit(object):
+    """
+    One difference between the label sequences of the answer tier and of the student tier
+    """
+
+    def __init__(self, op, expected_index, found_index, expected, found, expected_span, found_span) -> None:
+        '''
+        @param op: INSERT (a label only in the submission), DELETE (a label missing in the submission) or SUBSTITUTE
+        @param expected_index, found_index: the position of the label in the answer and in the student tier, None if absent
+        @param expected, found: the label names, None if absent
+        @param expected_span, found_span: the (start, end) times of the labels, None if absent
+        '''
+        self.op = op
+        self.expected_index = expected_index
+        self.found_index = found_index
+        self.expected = expected
+        self.found = found
+        self.expected_span = expected_span
+        self.found_span = found_span
+
+    def __repr__(self):
+        return "<TierEdit {:s} expected={!r} found={!r}>".format(self.op, self.expected, self.found)
+
+    def to_dict(self):
+        return {"op": self.op,
+                "expected_index": self.expected_index,
+                "found_index": self.found_index,
+                "expected": self.expected,
+                "found": self.found,
+                "expected_span": self.expected_span,
+                "found_span": self.found_span}
+
+
+def align_tiers(answer_tier, student_tier, max_edits=MAX_EDITS):
+    """
+    Aligns the ordered labels of two tiers of the same class
+    @return: the list of TierEdit in the order of the tiers, empty if the label sequences are identical,
+             or None if they differ by more than max_edits insertions and deletions
+    """
+    expected_names = tier_label_names(answer_tier)
+    found_names = tier_label_names(student_tier)
+    script = diff_sequences(expected_names, found_names, max_edits)
+    if script == None:
+        return None
+    expected_spans = tier_label_spans(answer_tier)
+    found_spans = tier_label_spans(student_tier)
+    edits = []
+    for op, i, j in _pair_substitutions(script):
+        edits.append(TierEdit(op, i, j,
+                              expected_names[i] if i != None else None,
+                              found_names[j] if j != None else None,
+                              expected_spans[i] if i != None else None,
+                              found_spans[j] if j != None else None))
+    return edits
@@ -0,0 +1,120 @@
+from data_models import *
+from data_models import _open_text_buffer, _contains, _content_hash
+from workspace import Workspace
+from fingerprint import FingerprintTree
+from profiling import sizeof_by_type
+import collections
+
+#################################################################
+# Answer Registry
+# the parsed formatting answers of every (course, term, lab), in a bounded LRU cache
+#################################################################
+
+FORMATTING_ANSWER_DIR = os.path.join(BASE_DIR, "formatting_answers")
+
+
+class AnswerEntry(object):
+    """
+    One parsed formatting answer held by the registry
+    """
+
+    def __init__(self, path) -> None:
+        '''
+        @param path: the path of the formatting answer
+        @param collection: the parsed Collection, without the raw text
+        @param tree: its fingerprint.FingerprintTree, the spec the submissions are compared with
+        @param mtime, sha256: the state of the file when it was parsed
+        @param nbytes: the approximate memory held by the entry
+        '''
+        self.path = path
+        self.mtime = os.path.getmtime(path)
+        self.sha256 = _content_hash(path)
+        with Workspace(prefix="Answer_registry_") as workspace:
+            txt_path = workspace.file_path("answer")
+            pm.read(path).save_as_text_file(txt_path)
+            with _open_text_buffer(txt_path) as text:
+                assert _contains(text, VALIDFILETYPE), "Error! The formatting answer {:s} is not a valid ooTextFile!".format(path)
+                self.collection = Collection(text, keep_text=False)
+        self.tree = FingerprintTree(self.collection)
+        self.nbytes = sum(sizeof_by_type(self.collection).values())
+
+    def is_current(self):
+        """
+        @return: whether the file still has the parsed content; a touched file with the same content stays current
+        """
+        mtime = os.path.getmtime(self.path)
+        if mtime == self.mtime:
+            return True
+        if _content_hash(self.path) != self.sha256:
+            return False
+        self.mtime = mtime
+        return True
+
+
+class AnswerRegistry(object):
+    """
+    Locates the formatting answer of a (course, term, lab) and caches the parsed answers,
+    evicting the least recently used ones beyond max_entries or max_bytes.
+    The answers of a course and term are in <root>/<course>/<term>/Lab<lab>.Collection;
+    without a course and a term, in <root>/Lab<lab>.Collection as distributed to the students.
+    """
+
+    def __init__(self, root=FORMATTING_ANSWER_DIR, max_entries=32, max_bytes=256*1024*1024) -> None:
+        '''
+        @param root: the directory of the formatting answers
+        @param max_entries: the maximal number of parsed answers kept
+        @param max_bytes: the maximal memory of the parsed answers kept, the last used answer is always kept
+        '''
+        self.root = root
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = collections.OrderedDict() # path -> AnswerEntry, least recently used first
+        self.nbytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def answer_path(self, lab_index, course=None, term=None):
+        """
+        @return: the path of the formatting answer of the lab
+        """
+        assert type(lab_index) == int, "You need to input an integer to identify which Lab your submission belongs to!"
+        assert (course == None) == (term == None), "Error! The course and the term of an answer should be given together!"
+        directory = self.root if course == None else os.path.join(self.root, course, term)
+        right_formatting_answer_path = os.path.join(directory, "Lab{:d}.Collection".format(lab_index))
+        assert os.path.isfile(right_formatting_answer_path), "Error! There is an error when locating the right answer {:s}, the program now is in {:s}".format(right_formatting_answer_path, BASE_DIR)
+        return right_formatting_answer_path
+
+    def get(self, lab_index, course=None, term=None):
+        """
+        @return: the AnswerEntry of the lab, parsed again if its file changed
+        """
+        return self.load(self.answer_path(lab_index, course, term))
+
+    def load(self, right_formatting_answer_path):
+        """
+        @return: the AnswerEntry of the formatting answer file, parsed again if the file changed
+        """
+        entry = self._entries.pop(right_formatting_answer_path, None)
+        if entry != None:
+            self.nbytes -= entry.nbytes
+            if not entry.is_current():
+                entry = None
+        if entry == None:
+            entry = AnswerEntry(right_formatting_answer_path)
+        self._entries[right_formatting_answer_path] = entry
+        self.nbytes += entry.nbytes
+        self._evict()
+        return entry
+
+    def _evict(self):
+        while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self.nbytes > self.max_bytes):
+            _, entry = self._entries.popitem(last=False)
+            self.nbytes -= entry.nbytes
+
+    def clear(self):
+        self._entries.clear()
+        self.nbytes = 0
+
+
+ANSWER_REGISTRY = AnswerRegistry() # shared by the checks of the process
@@ -0,0 +1,79 @@
+from utils import *
+from utils import _check_file_name, _parse_text, _parse_text_file, _compare_records, _compare_collections, _get_file_name, _get_right_formatting_answer_path
+from parse_guard import DEFAULT_PARSE_LIMITS
+import io
+import shutil
+
+#################################################################
+# In-memory Check API
+# used in-process by the LMS integration and the batch grader, no path on disk and no stdout
+#################################################################
+
+TEXT_COLLECTION_HEADER = re.compile(r'File type = "{:s}" *\r?\nObject class = "Collection" *\r?\n *\r?\nsize = \d+ *\r?\nitem \[\]:'.format(
+    VALIDFILETYPE).encode(TEXT_ENCODING))
+TEXT_COLLECTION_HEADER_SIZE = 256 # bytes, enough for the header of the long text format
+STREAM_CHUNK_SIZE = 1024*1024
+
+def _is_text_collection(data):
+    """
+    @return: whether data is a .Collection already saved as ooTextFile (ASCII/UTF-8) in the long text format, which can be parsed
+             without Praat; the short text format starts with the same file type but has no "size = " and "item []:" lines
+    """
+    return TEXT_COLLECTION_HEADER.match(bytes(data[:TEXT_COLLECTION_HEADER_SIZE])) != None
+
+def check_bytes(andrew_id, filename, data, lab_index, parse_limits=DEFAULT_PARSE_LIMITS, max_errors=None, fail_fast=False):
+    """
+    Checks a submission held in memory
+    A submission saved as ooTextFile text is not converted by Praat; a binary one
+    is converted by Praat in a workspace on tmpfs (Praat can only read files on a path)
+
+    @param andrew_id
+    @param filename: the name the submission was uploaded with, it should be "<andrew_id>_Lab<lab_index>.Collection"
+    @param data: the content of the .Collection file, bytes or any bytes-like object
+    @param lab_index: int, to locate the corresponding answer_file in the package
+    @param parse_limits: the parse_guard.ParseLimits bounding the parsing of the submission, DEFAULT_PARSE_LIMITS by default;
+                         None to parse a trusted text submission directly from the bytes, without a worker process
+    @param max_errors, fail_fast: bound the collected errors, see format_errors.ErrorCollector
+    @return: the list of format_errors.FormatError, empty if the submission is correctly formatted
+    """
+    if not _is_text_collection(data):
+        return check_stream(andrew_id, filename, io.BytesIO(data), lab_index, parse_limits=parse_limits,
+                            max_errors=max_errors, fail_fast=fail_fast)
+
+    right_formatting_answer_path = _get_right_formatting_answer_path(lab_index=lab_index)
+    collector = ErrorCollector(max_errors=max_errors, fail_fast=fail_fast)
+    error_collection_name = _check_file_name(andrew_id, filename, _get_file_name(right_formatting_answer_path))
+    if error_collection_name != None:
+        collector.add(error_collection_name)
+
+    if parse_limits == None:
+        student_answer_obj, error_student = _parse_text(memoryview(data))
+    else:
+        with Workspace() as workspace:
+            student_answer_path = workspace.file_path(andrew_id)
+            with open(student_answer_path, "wb") as f:
+                f.write(data)
+            student_answer_obj, error_student = _parse_text_file(student_answer_path, parse_limits=parse_limits)
+    if error_student != None:
+        collector.errors.append(error_student)
+        return collector.errors
+    answer = ANSWER_REGISTRY.load(right_formatting_answer_path)
+    return _compare_collections(student_answer_obj, answer.collection, collector, answer_tree=answer.tree)
+
+def check_stream(andrew_id, filename, stream, lab_index, parse_limits=DEFAULT_PARSE_LIMITS, max_errors=None, fail_fast=False):
+    """
+    Checks a submission read from a binary file-like object, e.g. an upload stream
+    The stream is copied chunk by chunk into a workspace on tmpfs, so it is never held in memory at once
+
+    @param stream: a readable binary file-like object with the content of the .Collection file
+    @param parse_limits: the parse_guard.ParseLimits bounding the parsing of the submission, None for a trusted one
+    @return: the list of format_errors.FormatError, empty if the submission is correctly formatted
+    """
+    right_formatting_answer_path = _get_right_formatting_answer_path(lab_index=lab_index)
+    with Workspace() as workspace:
+        student_answer_path = workspace.file_path(andrew_id, suffix=".Collection")
+        with open(student_answer_path, "wb") as f:
+            shutil.copyfileobj(stream, f, STREAM_CHUNK_SIZE)
+        return _compare_records(andrew_id, student_answer_path, right_formatting_answer_path,
+                                tmp_directory=workspace.path, parse_limits=parse_limits, student_answer_name=filename,
+                                max_errors=max_errors, fail_fast=fail_fast)
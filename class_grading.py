@@ -0,0 +1,194 @@
+from data_models import *
+from utils import _load_collection_or_none, _map_submissions, _get_right_formatting_answer_path, _get_student_andrew_id_list
+from precheck_for_teacher import _find_submission
+from answer_registry import ANSWER_REGISTRY
+from grading import answer_boundaries, error_bounds, graded_tiers, nearest_student_times, _find_tier
+import sys
+import json
+import warnings
+import multiprocessing
+
+#################################################################
+# Class Grading
+# the paired student times of every tier stacked into a (students x boundaries) matrix,
+# scored against the answer and its tolerances in one broadcast
+#################################################################
+
+def paired_times(student_answer_obj, right_answer_obj):
+    """
+    @return: (TextGrid name, tier name) -> the student times paired with the graded times of the answer tier, NaN if unpaired
+    """
+    student_textgrids = {item.nameid: item for item in student_answer_obj.items if item.classid == TEXTGRID}
+    paired = {}
+    for answer_textgrid in right_answer_obj.items:
+        if answer_textgrid.classid != TEXTGRID:
+            continue
+        student_textgrid = student_textgrids.get(answer_textgrid.nameid)
+        for answer_tier in graded_tiers(answer_textgrid):
+            student_tier = None
+            if student_textgrid != None:
+                student_tier = _find_tier(student_textgrid, answer_tier.classid, answer_tier.nameid)
+            paired[(answer_textgrid.nameid, answer_tier.nameid)] = nearest_student_times(answer_tier, student_tier)
+    return paired
+
+
+class TierMatrix(object):
+    """
+    The paired times of every student for one tier of the answer
+    """
+
+    def __init__(self, textgrid, tier, expected, bounds, found) -> None:
+        '''
+        @param expected, bounds: the answer times and their tolerances, arrays of shape (boundaries,)
+        @param found: the paired student times, an array of shape (students, boundaries), NaN if unpaired
+        @param errors: the absolute time errors, same shape as found
+        @param hits: whether each error is within its tolerance, same shape as found
+        '''
+        self.textgrid = textgrid
+        self.tier = tier
+        self.expected = expected
+        self.bounds = bounds
+        self.found = found
+        self.errors = np.abs(found - expected[np.newaxis, :])
+        self.hits = self.errors <= bounds[np.newaxis, :] # NaN compares False
+
+    def boundary_stats(self):
+        """
+        @return: the difficulty of every boundary across the class, as JSON-serializable dictionaries
+        """
+        with warnings.catch_warnings(): # a boundary nobody paired has NaN statistics
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            hit_rate = np.mean(self.hits, axis=0) if len(self.found) > 0 else np.full(self.expected.shape, np.nan)
+            median = np.nanmedian(self.errors, axis=0)
+            p90 = np.nanpercentile(self.errors, 90, axis=0)
+        missing = np.sum(np.isnan(self.found), axis=0)
+        stats = []
+        for i in range(len(self.expected)):
+            stats.append({"textgrid": self.textgrid,
+                          "tier": self.tier,
+                          "boundary": i,
+                          "time": float(self.expected[i]),
+                          "bound": float(self.bounds[i]),
+                          "hit_rate": _json_float(hit_rate[i]),
+                          "median_error": _json_float(median[i]),
+                          "p90_error": _json_float(p90[i]),
+                          "missing": int(missing[i])})
+        return stats
+
+
+def _json_float(value):
+    return None if np.isnan(value) else float(value)
+
+
+class ClassGrade(object):
+    """
+    The grades of a class for one lab, from the TierMatrix of every graded tier of the answer
+    """
+
+    def __init__(self, andrew_ids, matrices) -> None:
+        '''
+        @param andrew_ids: the students, in the order of the rows of the matrices
+        @param matrices: the list of TierMatrix
+        '''
+        self.andrew_ids = andrew_ids
+        self.matrices = matrices
+
+    def student_scores(self):
+        """
+        @return: andrew_id -> {"score": the fraction of all the boundaries within tolerance, "textgrids": textgrid -> score}
+        """
+        hits = np.zeros(len(self.andrew_ids))
+        total = 0
+        textgrid_hits = {}
+        for matrix in self.matrices:
+            tier_hits = np.sum(matrix.hits, axis=1)
+            hits += tier_hits
+            total += matrix.hits.shape[1]
+            previous_hits, previous_total = textgrid_hits.get(matrix.textgrid, (0, 0))
+            textgrid_hits[matrix.textgrid] = (previous_hits + tier_hits, previous_total + matrix.hits.shape[1])
+        scores = {}
+        for s, andrew_id in enumerate(self.andrew_ids):
+            scores[andrew_id] = {"score": float(hits[s]) / total if total > 0 else 1.,
+                                 "textgrids": {name: float(h[s]) / t if t > 0 else 1. for name, (h, t) in textgrid_hits.items()}}
+        return scores
+
+    def boundary_stats(self):
+        stats = []
+        for matrix in self.matrices:
+            stats.extend(matrix.boundary_stats())
+        return stats
+
+    def to_dict(self):
+        return {"students": self.student_scores(), "boundaries": self.boundary_stats()}
+
+
+def score_class(andrew_ids, paired_list, right_answer_obj):
+    """
+    @param andrew_ids: the students
+    @param paired_list: the paired_times of every student, in the same order
+    @param right_answer_obj: the answer Collection
+    @return: the ClassGrade
+    """
+    matrices = []
+    for answer_textgrid in right_answer_obj.items:
+        if answer_textgrid.classid != TEXTGRID:
+            continue
+        for answer_tier in graded_tiers(answer_textgrid):
+            key = (answer_textgrid.nameid, answer_tier.nameid)
+            expected = answer_boundaries(answer_tier)
+            found = np.array([paired[key] for paired in paired_list], dtype=float).reshape(len(paired_list), len(expected))
+            matrices.append(TierMatrix(key[0], key[1], expected, error_bounds(answer_textgrid, answer_tier, expected), found))
+    return ClassGrade(andrew_ids, matrices)
+
+def _paired_times_of_file(task):
+    """
+    Parses one submission and pairs its times with the answer, run in a worker process
+    @param task: (andrew_id, student_answer_path, right_formatting_answer_path)
+    @return: (andrew_id, paired_times), paired_times is None if the file cannot be parsed
+    """
+    andrew_id, student_answer_path, right_formatting_answer_path = task
+    student_answer_obj = _load_collection_or_none(student_answer_path, andrew_id)
+    if student_answer_obj == None:
+        return andrew_id, None
+    return andrew_id, paired_times(student_answer_obj, ANSWER_REGISTRY.load(right_formatting_answer_path).collection)
+
+def grade_class(submission_directory, lab_index, processes=None, andrew_ids=None):
+    """
+    Grades the boundaries of the submissions of the whole class at once;
+    the students without a parsable submission are left out
+    @return: the ClassGrade
+    """
+    assert os.path.isdir(submission_directory), "Error! {:s} is not a directory of submissions!".format(submission_directory)
+    right_formatting_answer_path = _get_right_formatting_answer_path(lab_index=lab_index)
+    if andrew_ids == None:
+        andrew_ids = _get_student_andrew_id_list()
+    tasks = []
+    for andrew_id in andrew_ids:
+        student_answer_path = _find_submission(submission_directory, andrew_id, lab_index)
+        if student_answer_path != None:
+            tasks.append((andrew_id, student_answer_path, right_formatting_answer_path))
+    results = [(andrew_id, paired) for andrew_id, paired in _map_submissions(_paired_times_of_file, tasks, processes) if paired != None]
+    right_answer_obj = ANSWER_REGISTRY.load(right_formatting_answer_path).collection
+    return score_class([andrew_id for andrew_id, _ in results], [paired for _, paired in results], right_answer_obj)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--submission-directory', type=str, required=True, help="Directory with all the submissions of the lab")
+    parser.add_argument('--lab-index', type=int, required=True, help="Which lab the submissions belong to")
+    parser.add_argument('--output', type=str, default="-", help="Path of the JSON report, - for stdout")
+    parser.add_argument('--processes', type=int, default=None, help="Number of worker processes, all the CPUs by default")
+
+    args = parser.parse_args()
+
+    class_grade = grade_class(args.submission_directory, args.lab_index, processes=args.processes)
+    output = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        json.dump(class_grade.to_dict(), output, indent=1)
+        output.write("\n")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main()
@@ -0,0 +1,278 @@
+from data_models import *
+from utils import _load_collection_or_none, _map_submissions
+from alignment import tier_label_names, diff_sequences, EQUAL
+from grading import ERROR_BOUND_SUFFIX
+import glob
+import collections
+import warnings
+import multiprocessing
+
+#################################################################
+# Consensus Answer
+# a proposed formatting answer for a new lab, from where most students put each boundary:
+# per-boundary medians, label majorities, and "-error-bound" tiers sized from the spread
+#################################################################
+
+MIN_ERROR_BOUND = 5 # milliseconds
+MAX_ERROR_BOUND = 50 # milliseconds
+SPREAD_SCALE = 2. # the error bound is this many robust standard deviations (1.4826 MAD) of the student boundaries
+MIN_SHARE = 0.5 # a TextGrid or tier is kept if at least this share of the students have it
+
+def _tier_events(tier):
+    """
+    @return: (label names, times, values) of the tier, the times are the starts of the intervals or the times of the points,
+             the values are the numbers after "=" in the marks of the points (NaN if none)
+    """
+    names = tier_label_names(tier)
+    if tier.classid == INTERVALTIER:
+        return names, tier.times()[:, 0], np.full(len(names), np.nan)
+    values = []
+    for l in tier.tier_labels:
+        value = l[1].split("=")[1].strip() if "=" in l[1] else ""
+        try:
+            values.append(float(value))
+        except ValueError:
+            values.append(np.nan)
+    return names, tier.times(), np.array(values, dtype=float)
+
+def collection_events(collection):
+    """
+    @return: the picklable summary of the TextGrids of a Collection,
+             [(TextGrid name, xmin, xmax, [(tier class, tier name, label names, times, values)])] in order
+    """
+    textgrids = []
+    for item in collection.items:
+        if item.classid != TEXTGRID:
+            continue
+        tiers = [(tier.classid, tier.nameid) + _tier_events(tier) for tier in item.tiers
+                 if not (tier.classid == TEXTTIER and tier.nameid.endswith(ERROR_BOUND_SUFFIX))]
+        textgrids.append((item.nameid, item.xmin, item.xmax, tiers))
+    return textgrids
+
+def _majority_labels(sequences):
+    """
+    @param sequences: label sequences of the same length
+    @return: the most frequent label at every position, on a tie the one of the earliest sequence
+    """
+    labels, codes = np.unique(np.array(sequences, dtype=object).ravel(), return_inverse=True)
+    codes = codes.reshape(len(sequences), -1)
+    positions = np.broadcast_to(np.arange(codes.shape[1]), codes.shape)
+    counts = np.zeros((codes.shape[1], len(labels)), dtype=int)
+    np.add.at(counts, (positions, codes), 1)
+    first = np.full(counts.shape, len(sequences)) # the first sequence with each label at each position
+    np.minimum.at(first, (positions, codes), np.broadcast_to(np.arange(len(sequences))[:, np.newaxis], codes.shape))
+    return [labels[c] for c in np.argmax(counts * (len(sequences) + 1) - first, axis=1)]
+
+
+def _align_intervals(student_events):
+    """
+    Aligns the intervals of the students to the majority label sequence of the students with the most common number of intervals
+    @return: (the label sequence, the (students, labels) matrices of the aligned times and values, NaN if not aligned)
+    """
+    size = collections.Counter(len(names) for names, _, _ in student_events).most_common(1)[0][0]
+    modal = [names for names, _, _ in student_events if len(names) == size]
+    labels = _majority_labels(modal) if size > 0 else []
+    times = np.full((len(student_events), size), np.nan)
+    values = np.full((len(student_events), size), np.nan)
+    for s, (names, student_times, student_values) in enumerate(student_events):
+        if len(names) == size: # the same intervals but a few substitutions, aligned position by position
+            times[s], values[s] = student_times, student_values
+            continue
+        script = diff_sequences(labels, names)
+        if script == None:
+            continue
+        aligned = np.array([(i, j) for op, i, j in script if op == EQUAL], dtype=int).reshape(-1, 2)
+        times[s, aligned[:, 0]] = student_times[aligned[:, 1]]
+        values[s, aligned[:, 0]] = student_values[aligned[:, 1]]
+    return labels, times, values
+
+def _align_points(student_events):
+    """
+    Aligns the points of the students by name, the order of the points follows the pitch contour of each recording;
+    a name gets the most common number of points with that name, its k-th point is aligned to the k-th of every student
+    @return: (the label sequence, the (students, labels) matrices of the aligned times and values, NaN if not aligned)
+    """
+    counters = [collections.Counter(names) for names, _, _ in student_events]
+    labels, columns = [], []
+    for name in collections.OrderedDict.fromkeys(n for names, _, _ in student_events for n in names):
+        count = collections.Counter(c[name] for c in counters).most_common(1)[0][0]
+        labels.extend([name] * count)
+        columns.append((name, count))
+    times = np.full((len(student_events), len(labels)), np.nan)
+    values = np.full((len(student_events), len(labels)), np.nan)
+    for s, (names, student_times, student_values) in enumerate(student_events):
+        names = np.array(names, dtype=object)
+        column = 0
+        for name, count in columns:
+            positions = np.flatnonzero(names == name)
+            positions = positions[np.argsort(student_times[positions], kind="stable")][:count]
+            times[s, column:column + len(positions)] = student_times[positions]
+            values[s, column:column + len(positions)] = student_values[positions]
+            column += count
+    return labels, times, values
+
+
+class ConsensusTier(object):
+    """
+    The proposed tier of the answer, from the same tier of many students
+    """
+
+    def __init__(self, classid, nameid, student_events) -> None:
+        '''
+        @param student_events: the (label names, times, values) of the tier of every student having it
+        @param labels: the label names, in time order
+        @param times, values: the median time and value of every label, over the students aligned to it
+        @param spreads: the robust standard deviation (1.4826 MAD) of the times, in seconds
+        '''
+        self.classid = classid
+        self.nameid = nameid
+        if classid == INTERVALTIER:
+            labels, times, values = _align_intervals(student_events)
+        else:
+            labels, times, values = _align_points(student_events)
+        with warnings.catch_warnings(): # the values of the unnumbered marks are all NaN
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            median_times = np.nanmedian(times, axis=0).reshape(-1)
+            order = np.argsort(median_times, kind="stable")
+            self.labels = [labels[i] for i in order]
+            self.times = median_times[order]
+            self.values = np.nanmedian(values, axis=0).reshape(-1)[order]
+            self.spreads = 1.4826 * np.nanmedian(np.abs(times - median_times[np.newaxis, :]), axis=0).reshape(-1)[order]
+
+    def error_bounds(self):
+        """
+        @return: the error bounds in milliseconds of the graded times, see graded_times
+        """
+        spreads = self.spreads[1:] if self.classid == INTERVALTIER else self.spreads
+        return np.clip(np.round(SPREAD_SCALE * spreads * 1000), MIN_ERROR_BOUND, MAX_ERROR_BOUND).astype(int)
+
+    def graded_times(self):
+        """
+        @return: the boundaries between the intervals, or the times of the points
+        """
+        return self.times[1:] if self.classid == INTERVALTIER else self.times
+
+    def marks(self):
+        """
+        @return: the marks of the points, with the median value of the students if they numbered them
+        """
+        return [label if np.isnan(value) else "{:s}={:.1f}".format(label, value) for label, value in zip(self.labels, self.values)]
+
+
+def _text(value):
+    return "\"{:s}\"".format(value.replace("\"", "\"\""))
+
+def _number(value):
+    return "{:.17g}".format(value)
+
+def _interval_tier_lines(nameid, xmin, xmax, labels, starts):
+    starts = np.clip(np.maximum.accumulate(np.append([xmin], starts[1:])), xmin, xmax)
+    ends = np.append(starts[1:], [xmax])
+    lines = ["class = \"IntervalTier\" ", "name = {:s} ".format(_text(nameid)), "xmin = {:s} ".format(_number(xmin)),
+             "xmax = {:s} ".format(_number(xmax)), "intervals: size = {:d} ".format(len(labels))]
+    for i, label in enumerate(labels):
+        lines.extend(["intervals [{:d}]:".format(i + 1), "    xmin = {:s} ".format(_number(starts[i])),
+                      "    xmax = {:s} ".format(_number(ends[i])), "    text = {:s} ".format(_text(label))])
+    return lines
+
+def _text_tier_lines(nameid, xmin, xmax, marks, times):
+    order = np.argsort(times, kind="stable")
+    lines = ["class = \"TextTier\" ", "name = {:s} ".format(_text(nameid)), "xmin = {:s} ".format(_number(xmin)),
+             "xmax = {:s} ".format(_number(xmax)), "points: size = {:d} ".format(len(marks))]
+    for i, p in enumerate(order):
+        lines.extend(["points [{:d}]:".format(i + 1), "    number = {:s} ".format(_number(times[p])),
+                      "    mark = {:s} ".format(_text(marks[p]))])
+    return lines
+
+def _indent(lines, spaces):
+    return [" " * spaces + line for line in lines]
+
+def consensus_textgrid_lines(nameid, xmin, xmax, consensus_tiers):
+    """
+    @return: the text lines of a TextGrid item of a Collection, with an "-error-bound" tier after every tier
+    """
+    tier_lines = []
+    for tier in consensus_tiers:
+        if tier.classid == INTERVALTIER:
+            tier_lines.append(_interval_tier_lines(tier.nameid, xmin, xmax, tier.labels, tier.times))
+        else:
+            tier_lines.append(_text_tier_lines(tier.nameid, xmin, xmax, tier.marks(), tier.times))
+        graded_times = tier.graded_times()
+        if len(graded_times) > 0:
+            bounds = [str(b) for b in tier.error_bounds()]
+            tier_lines.append(_text_tier_lines(tier.nameid + ERROR_BOUND_SUFFIX, xmin, xmax, bounds, graded_times))
+    lines = ["class = \"TextGrid\" ", "name = {:s} ".format(_text(nameid)), "xmin = {:s} ".format(_number(xmin)),
+             "xmax = {:s} ".format(_number(xmax)), "tiers? <exists> ", "size = {:d} ".format(len(tier_lines)), "item []: "]
+    for i, lines_of_tier in enumerate(tier_lines):
+        lines.append("    item [{:d}]:".format(i + 1))
+        lines.extend(_indent(lines_of_tier, 8))
+    return lines
+
+def consensus_collection_text(events_list, min_share=MIN_SHARE):
+    """
+    @param events_list: the collection_events of every student
+    @return: the ooTextFile text of the proposed formatting answer Collection
+    """
+    textgrid_events = collections.OrderedDict() # TextGrid name -> [(xmin, xmax, tiers)] of every student having it
+    for events in events_list:
+        for nameid, xmin, xmax, tiers in events:
+            textgrid_events.setdefault(nameid, []).append((xmin, xmax, tiers))
+    items = []
+    for nameid, students in textgrid_events.items():
+        if len(students) < min_share * len(events_list):
+            continue
+        tier_events = collections.OrderedDict() # (tier class, tier name) -> [(label names, times, values)]
+        for _, _, tiers in students:
+            for classid, tier_name, names, times, values in tiers:
+                tier_events.setdefault((classid, tier_name), []).append((names, times, values))
+        consensus_tiers = [ConsensusTier(classid, tier_name, student_events)
+                           for (classid, tier_name), student_events in tier_events.items() if len(student_events) >= min_share * len(students)]
+        xmin = float(np.median([s[0] for s in students]))
+        xmax = float(np.median([s[1] for s in students]))
+        items.append(consensus_textgrid_lines(nameid, xmin, xmax, consensus_tiers))
+    lines = ["File type = \"{:s}\"".format(VALIDFILETYPE), "Object class = \"Collection\"", "", "size = {:d} ".format(len(items)), "item []: "]
+    for i, item_lines in enumerate(items):
+        lines.append("    item [{:d}]:".format(i + 1))
+        lines.extend(_indent(item_lines, 8))
+    return "\n".join(lines) + "\n"
+
+def _events_of_file(student_answer_path):
+    """
+    Parses one submission, run in a worker process
+    @return: its collection_events, or None if it cannot be parsed
+    """
+    student_answer_obj = _load_collection_or_none(student_answer_path, "consensus")
+    if student_answer_obj == None:
+        return None
+    return collection_events(student_answer_obj)
+
+def consensus_answer(submission_paths, output_path, processes=None, min_share=MIN_SHARE):
+    """
+    Writes a proposed formatting answer built from the submissions of many students
+    @param submission_paths: the .Collection files of the students
+    @param output_path: the path of the proposed answer, in ooTextFile format (Praat reads it as a .Collection)
+    @return: the number of submissions used
+    """
+    events_list = [events for events in _map_submissions(_events_of_file, submission_paths, processes) if events != None]
+    assert len(events_list) > 0, "Error! None of the submissions can be parsed!"
+    with open(output_path, "w") as f:
+        f.write(consensus_collection_text(events_list, min_share))
+    return len(events_list)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--submission-directory', type=str, required=True, help="Directory with the .Collection submissions of the lab")
+    parser.add_argument('--output', type=str, required=True, help="Path of the proposed answer, e.g. formatting_answers/Lab4.Collection")
+    parser.add_argument('--processes', type=int, default=None, help="Number of worker processes, all the CPUs by default")
+    parser.add_argument('--min-share', type=float, default=MIN_SHARE, help="Keep the TextGrids and tiers that at least this share of the students have")
+
+    args = parser.parse_args()
+
+    assert os.path.isdir(args.submission_directory), "Error! {:s} is not a directory of submissions!".format(args.submission_directory)
+    submission_paths = sorted(glob.glob(os.path.join(glob.escape(args.submission_directory), "*.Collection")))
+    used = consensus_answer(submission_paths, args.output, processes=args.processes, min_share=args.min_share)
+    print("The proposed answer is built from {:d} of {:d} submissions: {:s}".format(used, len(submission_paths), args.output))
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main()
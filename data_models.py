@@ -8,6 +8,12 @@ import re
 import zipfile
 import xlsxwriter
 import argparse
+import functools
+import mmap
+import codecs
+import contextlib
+import hashlib
+from profiling import profile_stage
 
 #################################################################
 # Global Constant
@@ -21,6 +27,195 @@ TEXTTIER = "TextTier"
 STUDENT_ANDREW_ID_LIST = ["Test_Student1","Test_Student2"]
 STUDENT_ANDREW_ID_LIST.extend(["jiaqi{:d}".format(i) for i in range(8)])
 BASE_DIR = os.path.dirname(__file__) # set the directory that stores all the output files in the location of the distributed package/directory
+TEXT_ENCODING = "utf-8"  # encoding of the bytes-like (mmap/memoryview) inputs
+HASH_CHUNK_SIZE = 1024*1024 # bytes read at once when hashing a file
+
+
+#################################################################
+# Text Buffer Helpers
+# every parser accepts either a str or a bytes-like buffer (bytes, mmap, memoryview);
+# buffers are sliced as memoryviews, so only names, labels and numbers are copied out
+#################################################################
+
+@functools.lru_cache(maxsize=None)
+def _compile_pattern(pattern, as_bytes):
+    if as_bytes:
+        return re.compile(pattern.encode(TEXT_ENCODING))
+    return re.compile(pattern)
+
+def _compile(pattern, text):
+    """
+    @return: the compiled pattern, as a bytes pattern if text is a buffer
+    """
+    return _compile_pattern(pattern, not isinstance(text, str))
+
+def _as_buffer(text):
+    """
+    @return: text itself if it is a str, otherwise a memoryview so that slicing does not copy
+    """
+    if isinstance(text, (str, memoryview)):
+        return text
+    return memoryview(text)
+
+def _to_str(value):
+    """
+    @return: value decoded as str if it is a captured bytes group or a buffer slice
+    """
+    if isinstance(value, str):
+        return value
+    return bytes(value).decode(TEXT_ENCODING)
+
+def _contains(text, sub):
+    """
+    @return: whether the str sub occurs in text, for both str and buffer texts
+    """
+    return _compile(re.escape(sub), text).search(text) != None
+
+@contextlib.contextmanager
+def _open_text_buffer(path):
+    """
+    Maps a text file converted by Praat into memory, so that Collection can parse it without loading it into the heap
+    Praat writes UTF-16 when the labels are not ASCII, such files are decoded into a str instead
+
+    @param path: the path of the .txt file
+    @return: a memoryview over the mapped file, or a str
+    """
+    with open(path, "rb") as f:
+        bom = f.read(2)
+        if bom in (codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE):
+            f.seek(0)
+            yield f.read().decode("utf-16")
+            return
+        if os.fstat(f.fileno()).st_size == 0:
+            yield ""
+            return
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    view = memoryview(mapped)
+    buffer = view[len(codecs.BOM_UTF8):] if view[:len(codecs.BOM_UTF8)] == codecs.BOM_UTF8 else view
+    try:
+        yield buffer
+    finally:
+        buffer.release()
+        view.release()
+        try:
+            mapped.close()
+        except BufferError:  # some parsed object still holds a view (keep_text=True), the map is closed once it is collected
+            pass
+
+def _content_hash(path):
+    """
+    @return: the sha256 hex digest of the content of the file, read chunk by chunk
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+#################################################################
+# Tier Time Index
+# sorted boundary arrays of a tier, queried with searchsorted in O(log n)
+#################################################################
+
+def nearest_sorted(values, t):
+    """
+    Vectorized nearest-neighbour search in a sorted array
+    @param values: a sorted 1-D array
+    @param t: a value or an array of values
+    @return: (the nearest values, the distances to them), arrays shaped like t; NaN if values is empty
+    """
+    t = np.asarray(t, dtype=float)
+    if len(values) == 0:
+        return np.full(t.shape, np.nan), np.full(t.shape, np.nan)
+    nearest = values[nearest_positions(values, t)]
+    return nearest, np.abs(nearest - t)
+
+def nearest_positions(values, t):
+    """
+    @param values: a sorted, non-empty 1-D array
+    @param t: a value or an array of values
+    @return: the positions in values of the values nearest to t, an int array shaped like t
+    """
+    t = np.asarray(t, dtype=float)
+    right = np.clip(np.searchsorted(values, t), 0, len(values) - 1)
+    left = np.clip(right - 1, 0, len(values) - 1)
+    return np.where(np.abs(t - values[left]) <= np.abs(values[right] - t), left, right)
+
+
+class TierIndex(object):
+    """
+    The time index of an IntervalTier or a TextTier, built once from its times().
+    All the queries return positions in the tier_labels of the tier.
+    """
+
+    def __init__(self, tier) -> None:
+        '''
+        @param tier: an IntervalTier or a TextTier
+        @param starts, ends: the sorted start and end times of the labels, equal for points
+        @param order: the position in tier_labels of each sorted label
+        @param boundaries: the sorted distinct boundary times of the tier
+        '''
+        self.classid = tier.classid
+        times = tier.times()
+        if tier.classid == INTERVALTIER:
+            self.order = np.argsort(times[:, 0], kind="stable")
+            self.starts = times[self.order, 0]
+            self.ends = times[self.order, 1]
+            self.boundaries = np.unique(times)
+        else:
+            self.order = np.argsort(times, kind="stable")
+            self.starts = times[self.order]
+            self.ends = self.starts
+            self.boundaries = np.unique(times)
+
+    def __len__(self):
+        return len(self.order)
+
+    def at(self, t):
+        """
+        @return: the position of the interval covering t (start <= t < end, the last one also covers its end),
+                 or of the first point at t; None if there is none
+        """
+        if self.classid == INTERVALTIER:
+            i = np.searchsorted(self.starts, t, side="right") - 1
+            if i < 0 or t > self.ends[i] or (t == self.ends[i] and i != len(self.order) - 1):
+                return None
+        else:
+            i = np.searchsorted(self.starts, t, side="left")
+            if i == len(self.order) or self.starts[i] != t:
+                return None
+        return int(self.order[i])
+
+    def overlapping(self, t0, t1):
+        """
+        @return: the positions of the intervals overlapping (t0, t1), or of the points in [t0, t1], in time order
+        """
+        if self.classid == INTERVALTIER:
+            first = np.searchsorted(self.ends, t0, side="right")
+            last = np.searchsorted(self.starts, t1, side="left")
+        else:
+            first = np.searchsorted(self.starts, t0, side="left")
+            last = np.searchsorted(self.starts, t1, side="right")
+        return [int(i) for i in self.order[first:max(first, last)]]
+
+    def nearest_boundaries(self, t, inner=False):
+        """
+        @param t: a time or an array of times
+        @param inner: if True, the first and the last boundaries (the fixed ends of an IntervalTier) are left out
+        @return: (the nearest boundary times, the distances to them), arrays shaped like t; NaN if there is no boundary
+        """
+        return nearest_sorted(self.boundaries[1:-1] if inner else self.boundaries, t)
+
+    def nearest_boundary(self, t):
+        """
+        @return: (the boundary time nearest to t, the distance to it), or (None, None) if the tier is empty
+        """
+        if len(self.boundaries) == 0:
+            return None, None
+        nearest, distance = self.nearest_boundaries(t)
+        return float(nearest), float(distance)
 
 
 #################################################################
@@ -33,11 +228,13 @@ class BaseTier(object):
     will be implemented as either IntervalTier or TextTier
     '''
 
-    def __init__(self, tier_text) -> None:
+    def __init__(self, tier_text, keep_text=True) -> None:
         '''
         Initializes the universal attributes of tier: 
         class, name, xmin, xmax, size, transcript, total time.
         @type tier: a tier object; single item in the TextGrid list.
+        @param tier_text: str or memoryview of the tier in the TextGrid
+        @param keep_text: if False, tier_text, tier_info and transcript are dropped once the labels are extracted
         @param text_type:  TextGrid format
         @param t_time:  Total time of TextGrid file.
         @param classid:  Type of tier (point or interval).
@@ -57,7 +254,11 @@ class BaseTier(object):
         self.transcript = ""
         self.tier_info = ""
         self.tier_labels = []
+        self._times = None
+        self._time_index = None
         self._make_info()
+        if not keep_text:
+            self._release_text()
 
     def __iter__(self):
         return self
@@ -68,25 +269,25 @@ class BaseTier(object):
         classid, nameid, xmin, xmax, size, transcript.
         """
 
-        trans = "([\S\s]*)"
         classid = " +class = \"(.*)\" *[\r\n]+"
         nameid = " +name = \"(.*)\" *[\r\n]+"
         xmin = " +xmin = (\d+\.?\d*[e\-\d*]*) *[\r\n]+"
         xmax = " +xmax = (\d+\.?\d*[e\-\d*]*) *[\r\n]+"
         size = " +\S+: size = (\d+) *"
         
-        m = re.compile(classid + nameid + xmin + xmax + size + trans)
+        m = _compile(classid + nameid + xmin + xmax + size, self.tier_text)
         try:
-            self.tier_info = m.findall(self.tier_text)[0]
+            info = m.search(self.tier_text)
+            self.tier_info = info.groups()
         except:
-            print("ERR _make_info: ", self.tier_text)
-        self.classid = self.tier_info[0]
-        self.nameid = self.tier_info[1].strip()
+            print("ERR _make_info: ", _to_str(self.tier_text))
+        self.classid = _to_str(self.tier_info[0])
+        self.nameid = _to_str(self.tier_info[1]).strip()
         self.xmin = float(self.tier_info[2])
         self.xmax = float(self.tier_info[3])
         if self.size != None:
             self.size = int(self.tier_info[4])
-        self.transcript = self.tier_info[-1]
+        self.transcript = self.tier_text[info.end():] # a slice, not a copy, if tier_text is a memoryview
         self.tier_labels = self._make_tier_labels()
 
         assert self.size == len(self.tier_labels), "The size {:d} of the tier {:s} and \
@@ -97,6 +298,33 @@ class BaseTier(object):
         @return: List of the information that stored in the tier
         """
         return NotImplementedError
+
+    def times(self):
+        """
+        @return: the times of the labels as a float numpy array, built once; see the subclasses for its shape
+        """
+        if self._times is None:
+            self._times = self._make_times()
+        return self._times
+
+    def _make_times(self):
+        return NotImplementedError
+
+    def time_index(self):
+        """
+        @return: the TierIndex of the tier, built once
+        """
+        if self._time_index is None:
+            self._time_index = TierIndex(self)
+        return self._time_index
+
+    def _release_text(self):
+        """
+        Drops the raw text of the tier, only the structured fields are kept
+        """
+        self.tier_text = None
+        self.tier_info = None
+        self.transcript = None
     
     def tier_labels(self):
         """
@@ -164,8 +392,8 @@ class IntervalTier(BaseTier):
     A container for IntervalTier instance
     """
 
-    def __init__(self, tier) -> None:
-        super().__init__(tier)
+    def __init__(self, tier, keep_text=True) -> None:
+        super().__init__(tier, keep_text)
 
     def _make_tier_labels(self):
         """
@@ -177,10 +405,16 @@ class IntervalTier(BaseTier):
         label_xmax = " +\S+ = (\S+) *[\r\n]+"
         label_text = " +\S+ = \"([^\"]*?)\""
         
-        trans_m = re.compile(label_head + label_xmin + label_xmax + label_text)
+        trans_m = _compile(label_head + label_xmin + label_xmax + label_text, self.transcript)
         tier_labels = trans_m.findall(self.transcript)
-        self.tier_labels = [(float(tier_label[0].strip()), float(tier_label[1].strip()), tier_label[2].strip()) for tier_label in tier_labels]
+        self.tier_labels = [(float(tier_label[0].strip()), float(tier_label[1].strip()), _to_str(tier_label[2]).strip()) for tier_label in tier_labels]
         return self.tier_labels
+
+    def _make_times(self):
+        """
+        @return: the (start_time, end_time) of the intervals, an array of shape (size, 2)
+        """
+        return np.array([l[:2] for l in self.tier_labels], dtype=float).reshape(-1, 2)
     
 
 #################################################################
@@ -193,8 +427,8 @@ class TextTier(BaseTier):
     It can sort the labels based on the name of the markers
     """
 
-    def __init__(self, tier) -> None:
-        super().__init__(tier)
+    def __init__(self, tier, keep_text=True) -> None:
+        super().__init__(tier, keep_text)
 
     def _make_tier_labels(self):
         """
@@ -205,12 +439,18 @@ class TextTier(BaseTier):
         label_number = " +\S+ = (\S+) *[\r\n]+"
         label_text = " +\S+ = \"([^\"]*?)\""
         
-        trans_m = re.compile(label_head + label_number + label_text)
+        trans_m = _compile(label_head + label_number + label_text, self.transcript)
         tier_labels = trans_m.findall(self.transcript)
-        self.tier_labels = [(float(tier_label[0].strip()), tier_label[1].strip()) for tier_label in tier_labels]
+        self.tier_labels = [(float(tier_label[0].strip()), _to_str(tier_label[1]).strip()) for tier_label in tier_labels]
         self._sort_tier_labels()
 
         return self.tier_labels
+
+    def _make_times(self):
+        """
+        @return: the times of the points, an array of shape (size,)
+        """
+        return np.array([l[0] for l in self.tier_labels], dtype=float)
     
     def _sort_tier_labels(self):
         """
@@ -244,11 +484,12 @@ class TextGrid(object):
     Each TextGrid object has a number of tiers (size), xmin, xmax, and tiers with their own attributes.
     """
 
-    def __init__(self, textgrid_text):
+    def __init__(self, textgrid_text, keep_text=True):
         """
         Takes open read file as input, initializes attributes
         of the TextGrid file.
-        @type textgrid_text: textgrid text
+        @type textgrid_text: textgrid text, str or memoryview
+        @param keep_text: if False, the raw text of the TextGrid and its tiers is dropped after parsing
         @param size:  Number of tiers.
         @param xmin: xmin.
         @param xmax: xmax.
@@ -256,14 +497,17 @@ class TextGrid(object):
         @type tiers:  A list of tier objects.
         """
 
-        self.textgrid_text = textgrid_text
+        self.textgrid_text = _as_buffer(textgrid_text)
         self.nameid = ""
         self.classid = ""
         self.size = 0
         self.xmin = 0
         self.xmax = 0
         self.t_time = 0
+        self.keep_text = keep_text
         self.tiers = self._find_tiers()
+        if not keep_text:
+            self.textgrid_text = None
 
         assert self.size == len(self.tiers), "The size {:d} in the textgrid {:s} does \
             not match the detected tiers {:d}".format(self.size, self.nameid, len(self.tiers))
@@ -286,24 +530,19 @@ class TextGrid(object):
         tiers = []
 
         tier_re = header + "[\s\S]+?(?=" + header + "|$$)"
-        m = re.compile(tier_re)
+        m = _compile(tier_re, self.textgrid_text)
         tier_iter = m.finditer(self.textgrid_text)
         
         for iterator in tier_iter:
             (begin, end) = iterator.span()
             tier_text = self.textgrid_text[begin:end]
             tier_class = BaseTier
-            try: 
-                tmp = tier_text.index(INTERVALTIER)
+            if _contains(tier_text, INTERVALTIER):
                 tier_class = IntervalTier
-            except: 
-                try:
-                    tmp = tier_text.index(TEXTTIER)
-                    tier_class = TextTier
-                except:
-                    pass
+            elif _contains(tier_text, TEXTTIER):
+                tier_class = TextTier
             assert tier_class != BaseTier
-            tiers.append(tier_class(tier_text))
+            tiers.append(tier_class(tier_text, self.keep_text))
         return tiers
 
     def _find_tiers(self):
@@ -320,14 +559,14 @@ class TextGrid(object):
         # header = "\t\t\titem ?\[[^]]*\]:"
         header = "\n            item ?\[[^]]*\]:"
         
-        m = re.compile(classid + nameid + xmin + xmax + tiers + size)
+        m = _compile(classid + nameid + xmin + xmax + tiers + size, self.textgrid_text)
         try:
             file_info = m.findall(self.textgrid_text)[0]
         except:
-            print("ERR _find_tiers: "+ self.textgrid_text)
+            print("ERR _find_tiers: "+ _to_str(self.textgrid_text))
 
-        self.classid = file_info[0].strip()
-        self.nameid = file_info[1].strip()
+        self.classid = _to_str(file_info[0]).strip()
+        self.nameid = _to_str(file_info[1]).strip()
         self.xmin = float(file_info[2])
         self.xmax = float(file_info[3])
         self.t_time = self.xmax - self.xmin
@@ -345,11 +584,14 @@ class Sound2(object):
     A container for Sound 2 object.
     """
 
-    def __init__(self, sound_text):
+    def __init__(self, sound_text, keep_text=True, parse_samples=False):
         """
         Initializes attributes of the Sound file: class, name, xmin, xmax
         size, transcript, total time.
         Utilizes text_type to guide how to parse the file.
+        @param keep_text: if False, sound_text and sound_info are dropped after parsing
+        @param parse_samples: if True, the samples are parsed before the text is dropped; with the text kept
+                              they are parsed on the first access of z anyway
         @type tier: a tier object; single item in the TextGrid list.
         @param text_type:  TextGrid format
         @param t_time:  Total time of TextGrid file.
@@ -361,7 +603,7 @@ class Sound2(object):
         @param transcript:  The raw transcript for the tier.
         """
 
-        self.sound_text = sound_text
+        self.sound_text = _as_buffer(sound_text)
         self.classid = ""
         self.nameid = ""
         self.xmin = 0
@@ -374,9 +616,15 @@ class Sound2(object):
         self.ny = 0
         self.dy = 0
         self.y1 = 0
-        self.z = None
+        self._z = None
+        self._z_start = 0 # offset of the samples in sound_text
         self.sound_info = ""
         self._make_info()
+        if not keep_text:
+            if parse_samples:
+                self._z = self._make_samples(self.sound_text[self._z_start:])
+            self.sound_text = None
+            self.sound_info = None
 
     def _make_info(self):
 
@@ -395,12 +643,12 @@ class Sound2(object):
         dy = " +dy = (\d+\.?\d*[e\-\d*]*) *[\r\n]+"
         y1 = " +y1 = (\d+\.?\d*[e\-\d*]*) *[\r\n]+"
         pre_z = " +z \[\] \[\]: *[\r\n]+"
-        z = " +z \[\d+\]: *[\r\n]+ +z (\[\d+\] \[\d+\] = \d+\.?\d*[e\-\d*]*) *[\r\n]+"
         
-        m = re.compile(classid + nameid + xmin + xmax + nx + dx + x1 + ymin + ymax + ny + dy + y1 + pre_z + z)
-        self.sound_info = m.findall(self.sound_text)[0]
-        self.classid = self.sound_info[0]
-        self.nameid = self.sound_info[1].strip()
+        m = _compile(classid + nameid + xmin + xmax + nx + dx + x1 + ymin + ymax + ny + dy + y1 + pre_z, self.sound_text)
+        info = m.search(self.sound_text)
+        self.sound_info = info.groups()
+        self.classid = _to_str(self.sound_info[0])
+        self.nameid = _to_str(self.sound_info[1]).strip()
         self.xmin = float(self.sound_info[2])
         self.xmax = float(self.sound_info[3])
         self.nx = int(self.sound_info[4])
@@ -411,17 +659,34 @@ class Sound2(object):
         self.ny = int(self.sound_info[9])
         self.dy = float(self.sound_info[10])
         self.y1 = float(self.sound_info[11])
-        self.z = np.empty(shape=(self.ny, self.nx))
-        # print(self.z.shape)
-        
-        zs = self.sound_info[12:]
-        for z in zs:
-            mm = re.compile("\[(\d+)\] \[(\d+)\] = (\d+\.?\d*[e\-\d*]*)")
-            xyv = mm.findall(z)[0]
-            x = int(xyv[0])
-            y = int(xyv[1])
-            v = float(xyv[2])
-            self.z[x-1,y-1] = v
+        self._z_start = info.end()
+
+    @property
+    def z(self):
+        """
+        The samples, an array of shape (ny, nx), parsed from sound_text on the first access
+        """
+        if self._z is None:
+            assert self.sound_text != None, "Error! The samples of the Sound {:s} were dropped with its text, parse it with parse_samples=True!".format(self.nameid)
+            self._z = self._make_samples(self.sound_text[self._z_start:])
+        return self._z
+
+    def _make_samples(self, z_text):
+        """
+        Parses the "z [channel] [sample] = value" lines in one pass, the values are converted to float by numpy at once
+        @return: the samples, an array of shape (ny, nx), one row per channel
+        """
+        sample = " +z \[\d+\] \[\d+\] = (\S+)"
+        values = _compile(sample, z_text).findall(z_text)
+        assert len(values) == self.ny * self.nx, "The {:d} samples of the Sound {:s} do not match its {:d} channels of {:d} samples".format(
+            len(values), self.nameid, self.ny, self.nx)
+        return np.array(values, dtype=float).reshape(self.ny, self.nx)
+
+    def times(self):
+        """
+        @return: the times of the samples, an array of shape (nx,)
+        """
+        return self.x1 + self.dx * np.arange(self.nx)
 
 #################################################################
 # Collection Class
@@ -433,11 +698,25 @@ class Collection(object):
     TextGrid type or Sound 2 type
     """
 
-    def __init__(self, collection_text):
+    def __init__(self, collection_text, profiler=None, keep_text=True, parse_samples=False):
+        """
+        @param collection_text: the text of a .Collection file in ooTextFile format, either a str or 
+                                a bytes-like buffer (e.g. an mmap of the file), which is sliced without copying; 
+                                with keep_text=True the items keep views into the buffer, so it must stay open
+        @param profiler: an optional profiling.MemoryProfiler to measure the construction of each item
+        @param keep_text: if False, parse in low-memory mode: every item drops its raw text after parsing
+                          and only the structured fields (names, times, labels) are kept
+        @param parse_samples: if True, the samples of the Sounds are kept in low-memory mode too, e.g. for sound_checks;
+                              they are the bulk of a submission, so they are dropped with the text otherwise
+        """
 
-        self.collection_text = collection_text
+        self.collection_text = _as_buffer(collection_text)
         self.size = 0
-        self.items = self._find_items() # Items are either TextGrid or Sound2
+        self.keep_text = keep_text
+        self.parse_samples = parse_samples
+        self.items = self._find_items(profiler) # Items are either TextGrid or Sound2
+        if not keep_text:
+            self.collection_text = None
         assert int(self.size) == len(self.items), "Actual number of items {:d} does \
             not match the size attribute {:d} of the collection file".format(len(self.items), self.size)
 
@@ -451,7 +730,7 @@ class Collection(object):
         self.idx += 1
         return self.items[self.idx]
 
-    def _load_items(self, header):
+    def _load_items(self, header, profiler=None):
         """
         Iterates over each item and grabs tier information.
         """
@@ -459,27 +738,66 @@ class Collection(object):
         items = []
 
         item_re = header + "[\s\S]+?(?=" + header + "|$$)"
-        m = re.compile(item_re)
+        m = _compile(item_re, self.collection_text)
         item_iter = m.finditer(self.collection_text)
         for iterator in item_iter:
             (begin, end) = iterator.span()
             item_info = self.collection_text[begin:end]
             classid = " +class = \"(.*)\" *[\r\n]+"
-            m = re.compile(classid)
+            m = _compile(classid, item_info)
             try:
-                item_class = m.findall(item_info)[0]
+                item_class = _to_str(m.search(item_info).group(1))
             except:
-                print("ERR _load_items: "+ item_info)
+                print("ERR _load_items: "+ _to_str(item_info))
             if item_class == "TextGrid":
                 item_type = TextGrid
             elif item_class == "Sound 2":
                 item_type = Sound2
             else:
                 raise NotImplementedError("Only TextGrid and Sound 2 type are supported!")
-            items.append(item_type(item_info))
+            with profile_stage(profiler, "Collection item: " + item_class):
+                if item_type == Sound2:
+                    items.append(Sound2(item_info, self.keep_text, self.parse_samples))
+                else:
+                    items.append(TextGrid(item_info, self.keep_text))
         return items    
 
-    def _find_items(self):
+    def to_frame(self):
+        """
+        Flattens the labels of every tier of every TextGrid into one row per label
+        @return: a pandas.DataFrame with the columns textgrid, tier, tier_class, label (categorical),
+                 position (int32, the index of the label in its tier), xmin and xmax (float64, equal for a point)
+        """
+        textgrids, tiers, classes, labels, positions, starts, ends = [], [], [], [], [], [], []
+        for item in self.items:
+            if item.classid != TEXTGRID:
+                continue
+            for tier in item.tiers:
+                size = len(tier.tier_labels)
+                times = tier.times()
+                textgrids.append(np.full(size, item.nameid, dtype=object))
+                tiers.append(np.full(size, tier.nameid, dtype=object))
+                classes.append(np.full(size, tier.classid, dtype=object))
+                positions.append(np.arange(size, dtype=np.int32))
+                if tier.classid == INTERVALTIER:
+                    labels.append(np.array([l[2] for l in tier.tier_labels], dtype=object))
+                    starts.append(times[:, 0])
+                    ends.append(times[:, 1])
+                else:
+                    labels.append(np.array([l[1] for l in tier.tier_labels], dtype=object))
+                    starts.append(times)
+                    ends.append(times)
+        def column(parts, dtype):
+            return np.concatenate(parts) if len(parts) > 0 else np.empty(0, dtype=dtype)
+        return pd.DataFrame({"textgrid": pd.Categorical(column(textgrids, object)),
+                             "tier": pd.Categorical(column(tiers, object)),
+                             "tier_class": pd.Categorical(column(classes, object)),
+                             "position": column(positions, np.int32).astype(np.int32),
+                             "xmin": column(starts, np.float64).astype(np.float64),
+                             "xmax": column(ends, np.float64).astype(np.float64),
+                             "label": pd.Categorical(column(labels, object))})
+
+    def _find_items(self, profiler=None):
         """
         Splits the textgrid file into substrings corresponding to items.
         """
@@ -488,11 +806,10 @@ class Collection(object):
         #    size\ =\ (.*)[\r\n]+
         #     """)
         size = "\n ?size = (\d+\.?\d*[e\-\d*]*) *[\r\n]+"
-        m = re.compile(size)
+        m = _compile(size, self.collection_text)
         header = "\n    item \[\d+\]: *[\r\n]+"
 
-        sizes = m.findall(self.collection_text)
-        self.size = int(sizes[0])
-        items = self._load_items(header) 
+        self.size = int(m.search(self.collection_text).group(1))
+        items = self._load_items(header, profiler) 
         
         return items
\ No newline at end of file
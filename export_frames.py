@@ -0,0 +1,103 @@
+from data_models import *
+from utils import _load_collection_or_none, _map_submissions
+import glob
+import multiprocessing
+try:
+    import pyarrow # optional, only to write Parquet
+except ImportError:
+    pyarrow = None
+
+#################################################################
+# Frame Export
+# the labels of every submission flattened into one typed table, Parquet if pyarrow is installed, else gzip CSV
+#################################################################
+
+CATEGORY_COLUMNS = ["andrew_id", "file", "textgrid", "tier", "tier_class", "label"]
+COLUMN_TYPES = {"lab": "Int32", "position": np.int32, "xmin": np.float64, "xmax": np.float64}
+PARQUET_SUFFIX = ".parquet"
+CSV_SUFFIX = ".csv.gz"
+
+def _frame_of_file(task):
+    """
+    Parses one submission and flattens it, run in a worker process
+    @param task: (andrew_id, lab_index, student_answer_path)
+    @return: the DataFrame of the submission with its andrew_id, lab and file, or None if it cannot be parsed
+    """
+    andrew_id, lab_index, student_answer_path = task
+    student_answer_obj = _load_collection_or_none(student_answer_path, andrew_id)
+    if student_answer_obj == None:
+        return None
+    frame = student_answer_obj.to_frame()
+    frame.insert(0, "file", os.path.basename(student_answer_path))
+    frame.insert(0, "lab", lab_index)
+    frame.insert(0, "andrew_id", andrew_id)
+    return frame
+
+def _typed(frame):
+    """
+    @return: the frame with categorical names, int32 positions and float64 times
+    """
+    for name in CATEGORY_COLUMNS:
+        frame[name] = frame[name].astype(str).astype("category")
+    return frame.astype(COLUMN_TYPES)
+
+def collect_frames(submission_paths, lab_index=None, processes=None, skipped=None):
+    """
+    @param submission_paths: the .Collection files, named "<andrew_id>_..."
+    @param lab_index: the lab recorded in the rows, if known
+    @param skipped: an optional list, filled with the paths of the submissions that cannot be parsed
+    @return: one DataFrame with the labels of every parsable submission
+    """
+    tasks = [(os.path.basename(path).split("_")[0], lab_index, path) for path in submission_paths]
+    frames = list(_map_submissions(_frame_of_file, tasks, processes))
+    if skipped != None:
+        skipped.extend(path for path, frame in zip(submission_paths, frames) if frame is None)
+    frames = [frame for frame in frames if frame is not None]
+    if len(frames) == 0:
+        columns = ["andrew_id", "lab", "file", "textgrid", "tier", "tier_class", "position", "xmin", "xmax", "label"]
+        return _typed(pd.DataFrame({name: pd.Series([], dtype=object) for name in columns}))
+    return _typed(pd.concat(frames, ignore_index=True))
+
+def write_frame(frame, output_base):
+    """
+    Writes the frame to <output_base>.parquet if pyarrow is installed, otherwise to <output_base>.csv.gz
+    @return: the path written
+    """
+    if pyarrow != None:
+        path = output_base + PARQUET_SUFFIX
+        frame.to_parquet(path, index=False)
+    else:
+        path = output_base + CSV_SUFFIX
+        frame.to_csv(path, index=False, compression="gzip", float_format="%.17g") # the times read back exactly
+    return path
+
+def load_frame(path):
+    """
+    Loads an exported frame in one call, with the same column types whichever format it was written in
+    """
+    if path.endswith(PARQUET_SUFFIX):
+        return pd.read_parquet(path)
+    frame = pd.read_csv(path, compression="gzip", dtype={name: str for name in CATEGORY_COLUMNS}, keep_default_na=False,
+                        na_values={"lab": [""]}, float_precision="round_trip")
+    return _typed(frame)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--submission-directory', type=str, required=True, help="Directory with the .Collection submissions")
+    parser.add_argument('--lab-index', type=int, default=None, help="The lab of the submissions, recorded in every row")
+    parser.add_argument('--output', type=str, required=True, help="Path of the export without suffix, .parquet or .csv.gz is added")
+    parser.add_argument('--processes', type=int, default=None, help="Number of worker processes, all the CPUs by default")
+
+    args = parser.parse_args()
+
+    assert os.path.isdir(args.submission_directory), "Error! {:s} is not a directory of submissions!".format(args.submission_directory)
+    submission_paths = sorted(glob.glob(os.path.join(glob.escape(args.submission_directory), "*.Collection")))
+    skipped = []
+    frame = collect_frames(submission_paths, lab_index=args.lab_index, processes=args.processes, skipped=skipped)
+    path = write_frame(frame, args.output)
+    print("{:d} labels of {:d} submissions are exported to {:s}, {:d} submissions cannot be parsed".format(
+        len(frame), len(submission_paths) - len(skipped), path, len(skipped)))
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main()
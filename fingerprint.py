@@ -0,0 +1,133 @@
+from data_models import *
+from alignment import tier_label_names
+import hashlib
+import json
+
+#################################################################
+# Structural Fingerprint
+# a hash tree Collection -> TextGrid -> tier -> label names (ordered for intervals, a multiset for points);
+# a submission with the same root fingerprint as the answer passes _compare against it
+#################################################################
+
+ERROR_BOUND_SUFFIX = "-error-bound"
+
+def _is_error_bound(tier):
+    return tier.classid == TEXTTIER and tier.nameid.__contains__(ERROR_BOUND_SUFFIX)
+
+def _hash(parts):
+    return hashlib.sha256(json.dumps(parts).encode(TEXT_ENCODING)).hexdigest()
+
+
+class FingerprintNode(object):
+    """
+    A node of the hash tree, its digest covers the digests of all its children
+    """
+
+    def __init__(self, kind, name, digest, children=None) -> None:
+        '''
+        @param kind: TEXTGRID, INTERVALTIER or TEXTTIER, or "Collection" for the root
+        @param name: the name of the TextGrid or tier
+        @param digest: the hex digest of the subtree
+        @param children: the child nodes, a TextGrid's are its tiers
+        '''
+        self.kind = kind
+        self.name = name
+        self.digest = digest
+        self.children = children if children != None else []
+
+    def child(self, kind, name):
+        """
+        @return: the first child with the kind and name, or None
+        """
+        for node in self.children:
+            if node.kind == kind and node.name == name:
+                return node
+        return None
+
+    def __repr__(self):
+        return "<FingerprintNode {:s} \"{:s}\" {:s}>".format(self.kind, str(self.name), self.digest[:12])
+
+
+class FingerprintTree(object):
+    """
+    The hash tree of a Collection, built in one scan over its TextGrids
+    _compare matches the TextGrids and the tiers by name, so the digests combine the children in sorted order
+    and do not depend on the order the student saved them in; the labels of an interval tier are hashed in time order.
+    Times and Sound items are not hashed.
+    """
+
+    def __init__(self, collection) -> None:
+        '''
+        @param collection: a Collection object
+        @param root: the FingerprintNode of the Collection
+        '''
+        self._collection = collection # keeps the ids in _digests valid
+        self._digests = {} # id of a TextGrid or tier object of the Collection -> its digest
+        textgrid_nodes = []
+        for item in collection.items:
+            if item.classid != TEXTGRID:
+                continue
+            tier_nodes = []
+            for tier in item.tiers:
+                if _is_error_bound(tier):
+                    continue
+                names = tier_label_names(tier)
+                if tier.classid == TEXTTIER:
+                    names = sorted(names) # the points are checked as a multiset, see _compare
+                tier_node = FingerprintNode(tier.classid, tier.nameid, _hash([tier.classid, tier.nameid, len(names), names]))
+                self._digests[id(tier)] = tier_node.digest
+                tier_nodes.append(tier_node)
+            textgrid_node = FingerprintNode(TEXTGRID, item.nameid, _hash([item.nameid, sorted(n.digest for n in tier_nodes)]), tier_nodes)
+            self._digests[id(item)] = textgrid_node.digest
+            textgrid_nodes.append(textgrid_node)
+        self.root = FingerprintNode("Collection", None, _hash(sorted(n.digest for n in textgrid_nodes)), textgrid_nodes)
+
+    @property
+    def digest(self):
+        return self.root.digest
+
+    def digest_of(self, obj):
+        """
+        @param obj: a TextGrid or tier object of the Collection the tree was built from
+        @return: the digest of its subtree, or None for the skipped "-error-bound" tiers
+        """
+        return self._digests.get(id(obj))
+
+
+def diff_trees(answer_tree, student_tree):
+    """
+    Compares the two hash trees top-down, skipping every subtree whose digest matches
+
+    @return: the list of (textgrid name, tier kind, tier name, student digest) of every TextGrid (tier kind and
+             name None) or tier of the answer that is missing or different in the submission; the student digest
+             is None when it is missing
+    """
+    differences = []
+    if answer_tree.digest == student_tree.digest:
+        return differences
+    for textgrid_node in answer_tree.root.children:
+        student_textgrid_node = student_tree.root.child(TEXTGRID, textgrid_node.name)
+        if student_textgrid_node == None:
+            differences.append((textgrid_node.name, None, None, None))
+            continue
+        if student_textgrid_node.digest == textgrid_node.digest:
+            continue
+        for tier_node in textgrid_node.children:
+            student_tier_node = student_textgrid_node.child(tier_node.kind, tier_node.name)
+            if student_tier_node == None:
+                differences.append((textgrid_node.name, tier_node.kind, tier_node.name, None))
+            elif student_tier_node.digest != tier_node.digest:
+                differences.append((textgrid_node.name, tier_node.kind, tier_node.name, student_tier_node.digest))
+    return differences
+
+def mistake_signature(answer_tree, student_tree):
+    """
+    Students with the same signature made exactly the same mistakes: the same TextGrids and tiers differ
+    from the answer, and their differing tiers have the same content
+
+    @return: a short hex digest, or None if the submission matches the answer
+    """
+    differences = diff_trees(answer_tree, student_tree)
+    if len(differences) == 0:
+        return None
+    return _hash(sorted(differences, key=str))[:16]
@@ -0,0 +1,135 @@
+#################################################################
+# Format Error Codes
+#################################################################
+
+FILE_NAME_MISMATCH = "file_name_mismatch"
+FILE_TYPE_INVALID = "file_type_invalid"
+FILE_TOO_COMPLEX = "file_too_complex"
+TEXTGRID_NOT_FOUND = "textgrid_not_found"
+INTERVAL_TIER_NOT_FOUND = "interval_tier_not_found"
+POINT_TIER_NOT_FOUND = "point_tier_not_found"
+INTERVAL_COUNT_MISMATCH = "interval_count_mismatch"
+POINT_COUNT_MISMATCH = "point_count_mismatch"
+INTERVAL_NAME_MISMATCH = "interval_name_mismatch"
+POINT_NAME_MISMATCH = "point_name_mismatch"
+INTERVALS_NOT_CONTIGUOUS = "intervals_not_contiguous"
+TIER_BOUNDS_MISMATCH = "tier_bounds_mismatch"
+TIER_SPAN_MISMATCH = "tier_span_mismatch"
+POINT_OUT_OF_SPAN = "point_out_of_span"
+POINT_DUPLICATED = "point_duplicated"
+SOUND_SPAN_MISMATCH = "sound_span_mismatch"
+BOUNDARY_FAR_FROM_CHANGE = "boundary_far_from_change"
+ERRORS_TRUNCATED = "errors_truncated"
+
+NON_FATAL_CODES = [FILE_NAME_MISMATCH, SOUND_SPAN_MISMATCH, BOUNDARY_FAR_FROM_CHANGE, ERRORS_TRUNCATED] # the submission can still be graded with these errors
+
+
+#################################################################
+# FormatError Class
+#################################################################
+
+class FormatError(object):
+    """
+    A structured record of one formatting error found by the check.
+    str() of the record is the message printed to the students.
+    """
+
+    def __init__(self, code, message, textgrid=None, tier=None, expected=None, found=None, count=1, details=None) -> None:
+        '''
+        @param code: one of the error codes above
+        @param message: the human-readable description of the error
+        @param textgrid: the name of the TextGrid the error is found in, if any
+        @param tier: the name of the tier the error is found in, if any
+        @param expected: the value required by the formatting answer
+        @param found: the value found in the submission
+        @param count: the number of occurrences aggregated into this record, e.g. the number of mismatched labels in a tier
+        @param details: the JSON-serializable details of the error, e.g. the inserted, deleted and substituted labels of a tier
+        '''
+        self.code = code
+        self.message = message
+        self.textgrid = textgrid
+        self.tier = tier
+        self.expected = expected
+        self.found = found
+        self.count = count
+        self.details = details
+
+    @property
+    def fatal(self):
+        """
+        @return: whether the error prevents the submission from being graded
+        """
+        return self.code not in NON_FATAL_CODES
+
+    def __str__(self):
+        return self.message
+
+    def __repr__(self):
+        return "<FormatError {:s} textgrid={!r} tier={!r} expected={!r} found={!r}>".format(
+            self.code, self.textgrid, self.tier, self.expected, self.found)
+
+    def to_dict(self):
+        """
+        @return: the record as a JSON-serializable dictionary
+        """
+        return {"code": self.code,
+                "textgrid": self.textgrid,
+                "tier": self.tier,
+                "expected": self.expected,
+                "found": self.found,
+                "count": self.count,
+                "details": self.details,
+                "message": self.message}
+
+
+#################################################################
+# ErrorCollector Class
+#################################################################
+
+class ErrorLimitReached(Exception):
+    """
+    Raised by ErrorCollector.add to stop the check once no more errors are wanted
+    """
+    pass
+
+
+class ErrorCollector(object):
+    """
+    Collects the FormatError records of one check, bounding how many are kept.
+    The check stops (ErrorLimitReached) once max_errors records are collected,
+    or at the first fatal error in fail-fast mode.
+    """
+
+    def __init__(self, max_errors=None, fail_fast=False) -> None:
+        '''
+        @param max_errors: the maximal number of records to keep, unbounded if None
+        @param fail_fast: if True, stop at the first fatal error
+        '''
+        assert max_errors == None or max_errors > 0, "max_errors should be a positive integer!"
+        self.max_errors = max_errors
+        self.fail_fast = fail_fast
+        self.errors = []
+        self.truncated = False
+
+    def __len__(self):
+        return len(self.errors)
+
+    def add(self, error):
+        """
+        @raise ErrorLimitReached: if the check should stop after this error
+        """
+        if self.max_errors != None and len(self.errors) >= self.max_errors:
+            self.truncated = True
+            raise ErrorLimitReached()
+        self.errors.append(error)
+        if self.fail_fast and error.fatal:
+            raise ErrorLimitReached()
+
+    def finish(self):
+        """
+        @return: the collected records, with a final note if some errors were cut off by max_errors
+        """
+        if self.truncated:
+            error_truncated = "Too many formatting errors, only the first {:d} are shown.".format(self.max_errors)
+            return self.errors + [FormatError(ERRORS_TRUNCATED, error_truncated, expected=self.max_errors)]
+        return list(self.errors)
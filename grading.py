@@ -0,0 +1,162 @@
+from data_models import *
+from alignment import tier_label_names
+from fingerprint import ERROR_BOUND_SUFFIX
+
+#################################################################
+# Boundary Grading
+# every boundary and point of the answer is paired with the nearest one of the student,
+# and scored against the tolerance of its "-error-bound" tier (or DefaultTextTier)
+#################################################################
+
+ERROR_BOUND_UNIT = 1e-3 # the marks of the "-error-bound" points are in milliseconds
+DEFAULT_ERROR_BOUND = 20 # milliseconds, for the tiers without an "-error-bound" tier
+
+def _find_tier(textgrid, classid, nameid):
+    for tier in textgrid.tiers:
+        if tier.classid == classid and tier.nameid == nameid:
+            return tier
+    return None
+
+def answer_boundaries(tier):
+    """
+    @return: the graded times of an answer tier, i.e. the boundaries between its intervals (the ends of the tier are fixed),
+             or the times of its points
+    """
+    times = tier.times()
+    if tier.classid == INTERVALTIER:
+        return np.sort(times[1:, 0])
+    return times
+
+def error_bounds(answer_textgrid, tier, boundaries):
+    """
+    @param boundaries: the graded times of the answer tier, see answer_boundaries
+    @return: the tolerance in seconds of every boundary, from the point of the "<tier>-error-bound" tier nearest to it,
+             or from a DefaultTextTier if the answer has no such tier
+    """
+    bound_tier = _find_tier(answer_textgrid, TEXTTIER, tier.nameid + ERROR_BOUND_SUFFIX)
+    if bound_tier == None or len(bound_tier.tier_labels) == 0:
+        bound_tier = DefaultTextTier(tier.nameid, len(boundaries), DEFAULT_ERROR_BOUND)
+        return np.array([float(l[1]) for l in bound_tier.tier_labels]) * ERROR_BOUND_UNIT
+    bound_times = bound_tier.times()
+    order = np.argsort(bound_times)
+    bounds = np.array([float(l[1]) for l in bound_tier.tier_labels])[order] * ERROR_BOUND_UNIT
+    if len(boundaries) == 0:
+        return bounds[:0]
+    return bounds[nearest_positions(bound_times[order], boundaries)]
+
+def nearest_student_times(answer_tier, student_tier):
+    """
+    Pairs every graded time of the answer tier with the nearest boundary of the student tier, through its time_index;
+    a point is only paired with a student point of the same name
+    @return: the paired student times, NaN where the student has nothing to pair with
+    """
+    boundaries = answer_boundaries(answer_tier)
+    if student_tier == None:
+        return np.full(boundaries.shape, np.nan)
+    index = student_tier.time_index()
+    if answer_tier.classid == INTERVALTIER:
+        nearest, _ = index.nearest_boundaries(boundaries, inner=True)
+        return nearest
+    paired = np.full(boundaries.shape, np.nan)
+    answer_names = np.array(tier_label_names(answer_tier), dtype=object)
+    student_names = np.array(tier_label_names(student_tier), dtype=object)[index.order] # in the time order of index.starts
+    for name in set(answer_names):
+        paired[answer_names == name], _ = nearest_sorted(index.starts[student_names == name], boundaries[answer_names == name])
+    return paired
+
+
+class TierGrade(object):
+    """
+    The grade of one tier: every graded time of the answer, the paired student time and the tolerance
+    """
+
+    def __init__(self, textgrid, tier, classid, expected, found, bounds) -> None:
+        '''
+        @param textgrid, tier: the names of the TextGrid and of the tier
+        @param expected, found, bounds: arrays of the answer times, the paired student times (NaN if unpaired) and the tolerances
+        @param errors: the absolute time errors, NaN if unpaired
+        @param hits: whether each boundary is within its tolerance
+        '''
+        self.textgrid = textgrid
+        self.tier = tier
+        self.classid = classid
+        self.expected = expected
+        self.found = found
+        self.bounds = bounds
+        self.errors = np.abs(found - expected)
+        self.hits = self.errors <= bounds # NaN compares False
+
+    @property
+    def score(self):
+        """
+        @return: the fraction of the boundaries within tolerance, 1 for a tier without graded boundaries
+        """
+        if len(self.hits) == 0:
+            return 1.
+        return float(np.mean(self.hits))
+
+    def to_dict(self):
+        return {"textgrid": self.textgrid,
+                "tier": self.tier,
+                "score": self.score,
+                "hits": int(np.sum(self.hits)),
+                "total": len(self.hits),
+                "errors": [None if np.isnan(e) else float(e) for e in self.errors]}
+
+
+class TextGridGrade(object):
+    """
+    The grades of the tiers of one TextGrid, its score pools all its boundaries
+    """
+
+    def __init__(self, textgrid, tier_grades) -> None:
+        self.textgrid = textgrid
+        self.tier_grades = tier_grades
+
+    @property
+    def score(self):
+        total = sum(len(g.hits) for g in self.tier_grades)
+        if total == 0:
+            return 1.
+        return float(sum(np.sum(g.hits) for g in self.tier_grades)) / total
+
+    def to_dict(self):
+        return {"textgrid": self.textgrid,
+                "score": self.score,
+                "tiers": [g.to_dict() for g in self.tier_grades]}
+
+
+def grade_tier(answer_textgrid, answer_tier, student_tier):
+    """
+    @param student_tier: the tier of the same class and name in the submission, or None if it is missing
+    @return: the TierGrade of the student tier
+    """
+    boundaries = answer_boundaries(answer_tier)
+    return TierGrade(answer_textgrid.nameid, answer_tier.nameid, answer_tier.classid, boundaries,
+                     nearest_student_times(answer_tier, student_tier), error_bounds(answer_textgrid, answer_tier, boundaries))
+
+def graded_tiers(answer_textgrid):
+    """
+    @return: the tiers of the answer TextGrid that are graded, i.e. all but the "-error-bound" ones
+    """
+    return [tier for tier in answer_textgrid.tiers if not (tier.classid == TEXTTIER and tier.nameid.endswith(ERROR_BOUND_SUFFIX))]
+
+def grade_collection(student_answer_obj, right_answer_obj):
+    """
+    Grades the boundaries and points of a submission against the answer; a missing TextGrid or tier scores 0
+    @return: the list of TextGridGrade, one per TextGrid of the answer
+    """
+    student_textgrids = {item.nameid: item for item in student_answer_obj.items if item.classid == TEXTGRID}
+    grades = []
+    for answer_textgrid in right_answer_obj.items:
+        if answer_textgrid.classid != TEXTGRID:
+            continue
+        student_textgrid = student_textgrids.get(answer_textgrid.nameid)
+        tier_grades = []
+        for answer_tier in graded_tiers(answer_textgrid):
+            student_tier = None
+            if student_textgrid != None:
+                student_tier = _find_tier(student_textgrid, answer_tier.classid, answer_tier.nameid)
+            tier_grades.append(grade_tier(answer_textgrid, answer_tier, student_tier))
+        grades.append(TextGridGrade(answer_textgrid.nameid, tier_grades))
+    return grades
@@ -0,0 +1,244 @@
+from data_models import *
+from data_models import _content_hash
+from utils import _load_collection_or_none, _map_submissions
+import glob
+import sqlite3
+import multiprocessing
+
+#################################################################
+# SQLite Ingest
+# every distinct submission content parsed once into indexed tables: contents -> textgrids -> tiers -> labels,
+# and one row per student in submissions pointing to its content, so identical group submissions are all kept
+#################################################################
+
+INSERT_BATCH_SIZE = 500 # parsed contents per transaction
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS contents (
+    id INTEGER PRIMARY KEY,
+    sha256 TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS submissions (
+    id INTEGER PRIMARY KEY,
+    content_id INTEGER NOT NULL REFERENCES contents(id),
+    andrew_id TEXT NOT NULL,
+    lab INTEGER,
+    course TEXT,
+    term TEXT,
+    file TEXT NOT NULL,
+    submitted_at TEXT NOT NULL,
+    ingested_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS textgrids (
+    id INTEGER PRIMARY KEY,
+    content_id INTEGER NOT NULL REFERENCES contents(id),
+    name TEXT NOT NULL,
+    xmin REAL NOT NULL,
+    xmax REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tiers (
+    id INTEGER PRIMARY KEY,
+    textgrid_id INTEGER NOT NULL REFERENCES textgrids(id),
+    name TEXT NOT NULL,
+    class TEXT NOT NULL,
+    xmin REAL NOT NULL,
+    xmax REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS labels (
+    tier_id INTEGER NOT NULL REFERENCES tiers(id),
+    position INTEGER NOT NULL,
+    xmin REAL NOT NULL,
+    xmax REAL NOT NULL,
+    label TEXT NOT NULL,
+    PRIMARY KEY (tier_id, position)
+) WITHOUT ROWID;
+CREATE UNIQUE INDEX IF NOT EXISTS submissions_key ON submissions(content_id, andrew_id, COALESCE(lab, -1), COALESCE(course, ''), COALESCE(term, ''));
+CREATE INDEX IF NOT EXISTS submissions_lab ON submissions(lab, submitted_at);
+CREATE INDEX IF NOT EXISTS submissions_student ON submissions(andrew_id, lab);
+CREATE INDEX IF NOT EXISTS textgrids_content ON textgrids(content_id);
+CREATE INDEX IF NOT EXISTS textgrids_name ON textgrids(name);
+CREATE INDEX IF NOT EXISTS tiers_textgrid ON tiers(textgrid_id);
+CREATE INDEX IF NOT EXISTS tiers_name ON tiers(name, textgrid_id);
+"""
+
+def connect(database_path):
+    """
+    @return: a connection to the database, with the tables created if needed
+    """
+    connection = sqlite3.connect(database_path)
+    version = connection.execute("PRAGMA user_version").fetchone()[0]
+    has_submissions = connection.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'submissions'").fetchone()[0] > 0
+    assert version == SCHEMA_VERSION or not has_submissions, "Error! The database {:s} has the tables of another version, ingest into a new one!".format(database_path)
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.execute("PRAGMA synchronous = NORMAL")
+    connection.executescript(SCHEMA)
+    connection.execute("PRAGMA user_version = {:d}".format(SCHEMA_VERSION))
+    return connection
+
+def collection_rows(collection):
+    """
+    @return: the picklable content of the TextGrids of a Collection,
+             [(name, xmin, xmax, [(tier name, tier class, xmin, xmax, [(position, xmin, xmax, label)])])]
+    """
+    textgrids = []
+    for item in collection.items:
+        if item.classid != TEXTGRID:
+            continue
+        tiers = []
+        for tier in item.tiers:
+            if tier.classid == INTERVALTIER:
+                labels = [(p, l[0], l[1], l[2]) for p, l in enumerate(tier.tier_labels)]
+            else:
+                labels = [(p, l[0], l[0], l[1]) for p, l in enumerate(tier.tier_labels)]
+            tiers.append((tier.nameid, tier.classid, tier.xmin, tier.xmax, labels))
+        textgrids.append((item.nameid, item.xmin, item.xmax, tiers))
+    return textgrids
+
+def _rows_of_file(task):
+    """
+    Parses one submission, run in a worker process
+    @param task: (sha256, student_answer_path)
+    @return: (sha256, collection_rows), the rows are None if the file cannot be parsed
+    """
+    sha256, student_answer_path = task
+    student_answer_obj = _load_collection_or_none(student_answer_path, "ingest")
+    if student_answer_obj == None:
+        return sha256, None
+    return sha256, collection_rows(student_answer_obj)
+
+def _next_id(connection, table):
+    return connection.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM {:s}".format(table)).fetchone()[0]
+
+def _insert_batch(connection, contents, submissions, content_ids):
+    """
+    Inserts the parsed contents and the submissions in one transaction, the ids are assigned here so that every table is filled by executemany
+    @param contents: the list of (sha256, collection_rows) not stored yet
+    @param submissions: the list of (sha256, andrew_id, lab, course, term, file, submitted_at, ingested_at), their content stored or in contents
+    @param content_ids: sha256 -> id of the stored contents, the new contents are added to it
+    """
+    with connection:
+        content_id = _next_id(connection, "contents")
+        textgrid_id = _next_id(connection, "textgrids")
+        tier_id = _next_id(connection, "tiers")
+        content_rows, textgrid_rows, tier_rows, label_rows = [], [], [], []
+        for sha256, textgrids in contents:
+            content_rows.append((content_id, sha256))
+            content_ids[sha256] = content_id
+            for name, xmin, xmax, tiers in textgrids:
+                textgrid_rows.append((textgrid_id, content_id, name, xmin, xmax))
+                for tier_name, classid, tier_xmin, tier_xmax, labels in tiers:
+                    tier_rows.append((tier_id, textgrid_id, tier_name, classid, tier_xmin, tier_xmax, len(labels)))
+                    label_rows.extend((tier_id,) + label for label in labels)
+                    tier_id += 1
+                textgrid_id += 1
+            content_id += 1
+        submission_id = _next_id(connection, "submissions")
+        submission_rows = [(submission_id + i, content_ids[submission[0]]) + submission[1:] for i, submission in enumerate(submissions)]
+        connection.executemany("INSERT INTO contents VALUES (?, ?)", content_rows)
+        connection.executemany("INSERT INTO textgrids VALUES (?, ?, ?, ?, ?)", textgrid_rows)
+        connection.executemany("INSERT INTO tiers VALUES (?, ?, ?, ?, ?, ?, ?)", tier_rows)
+        connection.executemany("INSERT INTO labels VALUES (?, ?, ?, ?, ?)", label_rows)
+        connection.executemany("INSERT INTO submissions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", submission_rows)
+
+def ingest(connection, submission_paths, lab_index=None, course=None, term=None, processes=None):
+    """
+    Stores the submissions not stored yet; a content is only parsed if no submission with the same content is stored,
+    so identical submissions of several students are parsed once and stored for each of them
+    @param submission_paths: the .Collection files, named "<andrew_id>_..."; their mtime is the submission time
+    @return: (the number of submissions stored, the number skipped as already stored for the student, lab, course and term,
+              the number that cannot be parsed)
+    """
+    content_ids = dict(connection.execute("SELECT sha256, id FROM contents"))
+    stored = set(connection.execute("SELECT c.sha256, s.andrew_id, s.lab, s.course, s.term FROM submissions s "
+                                    "JOIN contents c ON c.id = s.content_id"))
+    waiting = {} # sha256 -> the submissions with this content, waiting for it to be parsed
+    ready = [] # the submissions whose content is stored
+    tasks = []
+    skipped = 0
+    for path in submission_paths:
+        sha256 = _content_hash(path)
+        andrew_id = os.path.basename(path).split("_")[0]
+        key = (sha256, andrew_id, lab_index, course, term)
+        if key in stored:
+            skipped += 1
+            continue
+        stored.add(key)
+        submitted_at = datetime.datetime.fromtimestamp(os.path.getmtime(path)).isoformat(timespec="seconds")
+        submission = key + (os.path.basename(path), submitted_at, datetime.datetime.now().isoformat(timespec="seconds"))
+        if sha256 in content_ids:
+            ready.append(submission)
+            continue
+        if sha256 not in waiting:
+            waiting[sha256] = []
+            tasks.append((sha256, path))
+        waiting[sha256].append(submission)
+
+    added, failed = 0, 0
+    contents = []
+    results = _map_submissions(_rows_of_file, tasks, processes)
+    try:
+        for sha256, textgrids in results:
+            if textgrids == None:
+                failed += len(waiting[sha256])
+                continue
+            contents.append((sha256, textgrids))
+            ready.extend(waiting[sha256])
+            if len(contents) >= INSERT_BATCH_SIZE:
+                _insert_batch(connection, contents, ready, content_ids)
+                added += len(ready)
+                contents, ready = [], []
+        if len(contents) > 0 or len(ready) > 0:
+            _insert_batch(connection, contents, ready, content_ids)
+            added += len(ready)
+    finally:
+        results.close()
+    return added, skipped, failed
+
+def tier_boundaries(connection, tier_name, lab_index=None, since=None, textgrid_name=None):
+    """
+    e.g. all the students' boundaries of the Tip tiers of Lab3 since 2024: tier_boundaries(connection, "Tip", 3, "2024")
+    @param since: an ISO date, only the submissions made since then
+    @return: the list of (andrew_id, TextGrid name, position, xmin, xmax, label) of the labels of the tiers with the name
+    """
+    query = ("SELECT s.andrew_id, g.name, l.position, l.xmin, l.xmax, l.label FROM tiers t "
+             "JOIN textgrids g ON g.id = t.textgrid_id JOIN submissions s ON s.content_id = g.content_id "
+             "JOIN labels l ON l.tier_id = t.id WHERE t.name = ?")
+    parameters = [tier_name]
+    if lab_index != None:
+        query += " AND s.lab = ?"
+        parameters.append(lab_index)
+    if since != None:
+        query += " AND s.submitted_at >= ?"
+        parameters.append(since)
+    if textgrid_name != None:
+        query += " AND g.name = ?"
+        parameters.append(textgrid_name)
+    query += " ORDER BY s.andrew_id, g.name, l.position"
+    return connection.execute(query, parameters).fetchall()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--database', type=str, required=True, help="Path of the SQLite database, created if needed")
+    parser.add_argument('--submission-directory', type=str, required=True, help="Directory with the .Collection submissions")
+    parser.add_argument('--lab-index', type=int, default=None, help="The lab of the submissions")
+    parser.add_argument('--course', type=str, default=None, help="The course of the submissions, e.g. 80-788")
+    parser.add_argument('--term', type=str, default=None, help="The term of the submissions, e.g. S24")
+    parser.add_argument('--processes', type=int, default=None, help="Number of worker processes, all the CPUs by default")
+
+    args = parser.parse_args()
+
+    assert os.path.isdir(args.submission_directory), "Error! {:s} is not a directory of submissions!".format(args.submission_directory)
+    submission_paths = sorted(glob.glob(os.path.join(glob.escape(args.submission_directory), "*.Collection")))
+    connection = connect(args.database)
+    try:
+        added, skipped, failed = ingest(connection, submission_paths, lab_index=args.lab_index, course=args.course,
+                                        term=args.term, processes=args.processes)
+    finally:
+        connection.close()
+    print("{:d} submissions are stored, {:d} are already stored, {:d} cannot be parsed".format(added, skipped, failed))
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main()
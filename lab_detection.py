@@ -0,0 +1,123 @@
+from data_models import *
+from utils import _load_collection
+from workspace import Workspace
+from fingerprint import FingerprintTree
+from answer_registry import ANSWER_REGISTRY, FORMATTING_ANSWER_DIR
+import re
+import glob
+
+#################################################################
+# Lab Detection
+# an inverted index from the TextGrid and tier names of every formatting answer to its labs;
+# a submission votes with its own names, so the best lab is found without checking against every lab
+#################################################################
+
+LAB_FILE_NAME = re.compile(r"^Lab(\d+)\.Collection$")
+LAB_INDEXES = {} # answer directory -> LabIndex, filled by get_lab_index
+
+def _tree_names(tree):
+    """
+    @param tree: the fingerprint.FingerprintTree of a Collection, without the "-error-bound" tiers
+    @return: the set of names of the Collection, i.e. its TextGrid names and its (TextGrid name, tier class, tier name)
+    """
+    names = set()
+    for textgrid_node in tree.root.children:
+        names.add(textgrid_node.name)
+        for tier_node in textgrid_node.children:
+            names.add((textgrid_node.name, tier_node.kind, tier_node.name))
+    return names
+
+
+class LabIndex(object):
+    """
+    The index of the names of every LabN.Collection in the answer directory, built once per process.
+    Detection costs one dictionary lookup per name of the submission, whatever the number of labs.
+    """
+
+    def __init__(self, answer_directory=FORMATTING_ANSWER_DIR) -> None:
+        '''
+        @param answer_directory: the directory with the formatting answers, named "Lab<lab_index>.Collection"
+        @param answer_paths: lab index -> path of its formatting answer
+        @param mtimes: lab index -> mtime of its formatting answer when indexed
+        '''
+        self.answer_directory = answer_directory
+        self.answer_paths = {}
+        self.mtimes = {}
+        self._labs_by_name = {} # name -> set of lab indexes
+        self._name_counts = {} # lab index -> number of names
+        for path in sorted(glob.glob(os.path.join(glob.escape(answer_directory), "Lab*.Collection"))):
+            match = LAB_FILE_NAME.match(os.path.basename(path))
+            if match == None:
+                continue
+            lab_index = int(match.group(1))
+            self.answer_paths[lab_index] = path
+            self.mtimes[lab_index] = os.path.getmtime(path)
+            self._add_lab(lab_index, ANSWER_REGISTRY.load(path).tree) # also warms the answers for the check
+
+    def _add_lab(self, lab_index, tree):
+        names = _tree_names(tree)
+        self._name_counts[lab_index] = len(names)
+        for name in names:
+            self._labs_by_name.setdefault(name, set()).add(lab_index)
+
+    @property
+    def labs(self):
+        return sorted(self.answer_paths)
+
+    def is_stale(self):
+        """
+        @return: whether a formatting answer was added, removed or modified since the index was built
+        """
+        paths = glob.glob(os.path.join(glob.escape(self.answer_directory), "Lab*.Collection"))
+        if len([p for p in paths if LAB_FILE_NAME.match(os.path.basename(p)) != None]) != len(self.answer_paths):
+            return True
+        for lab_index, path in self.answer_paths.items():
+            if not os.path.isfile(path) or os.path.getmtime(path) != self.mtimes[lab_index]:
+                return True
+        return False
+
+    def scores(self, collection):
+        """
+        @param collection: a Collection object, or its fingerprint.FingerprintTree
+        @return: lab index -> Dice similarity of the names of the submission and of the lab answer, in [0, 1],
+                 for every lab sharing at least one name with the submission
+        """
+        tree = collection if isinstance(collection, FingerprintTree) else FingerprintTree(collection)
+        names = _tree_names(tree)
+        matches = {}
+        for name in names:
+            for lab_index in self._labs_by_name.get(name, ()):
+                matches[lab_index] = matches.get(lab_index, 0) + 1
+        return {lab_index: 2. * count / (len(names) + self._name_counts[lab_index]) for lab_index, count in matches.items()}
+
+    def detect(self, collection):
+        """
+        @return: (the lab index with the best score, its score), or (None, 0.) if no lab shares a name with the submission
+        """
+        scores = self.scores(collection)
+        if len(scores) == 0:
+            return None, 0.
+        lab_index = max(sorted(scores), key=lambda l: scores[l]) # the lowest lab index wins a tie
+        return lab_index, scores[lab_index]
+
+
+def get_lab_index(answer_directory=FORMATTING_ANSWER_DIR):
+    """
+    @return: the LabIndex of the answer directory, built on the first call and rebuilt when an answer changes
+    """
+    lab_index = LAB_INDEXES.get(answer_directory)
+    if lab_index == None or lab_index.is_stale():
+        lab_index = LabIndex(answer_directory)
+        LAB_INDEXES[answer_directory] = lab_index
+    return lab_index
+
+def detect_lab(student_answer_path, answer_directory=FORMATTING_ANSWER_DIR):
+    """
+    Detects which lab a .Collection file was made for, from the names of its TextGrids and tiers
+    @return: (lab index, score), see LabIndex.detect; (None, 0.) if the file cannot be parsed
+    """
+    with Workspace() as workspace:
+        student_answer_obj, error_student = _load_collection(student_answer_path, workspace, "detect")
+    if error_student != None:
+        return None, 0.
+    return get_lab_index(answer_directory).detect(student_answer_obj)
@@ -0,0 +1,197 @@
+from data_models import *
+from utils import _load_collection_or_none, _map_submissions, _get_right_formatting_answer_path, _get_student_andrew_id_list, _count_label_mismatches
+from precheck_for_teacher import _find_submission
+from answer_registry import ANSWER_REGISTRY
+from alignment import align_tiers, tier_label_names, INSERT, DELETE, SUBSTITUTE
+from grading import graded_tiers, _find_tier
+import sys
+import json
+import collections
+import multiprocessing
+
+#################################################################
+# Label Confusion
+# every mismatched label of the class paired with the expected label it stands for,
+# counted into one (expected x found) matrix per tier of the answer
+#################################################################
+
+MISSING_LABEL = "<missing>" # the found column of an expected label the student left out
+EXTRA_LABEL = "<extra>" # the expected row of a correctly named label the student added
+TOP_CONFUSIONS = 20
+
+@functools.lru_cache(maxsize=65536)
+def label_distance(found, expected):
+    """
+    The same few misspellings recur across a class, so the distance of every (found, expected) pair is memoised,
+    whatever the other candidates left for the found label are
+    """
+    return editdistance.eval(found, expected)
+
+def label_distances(found, candidates):
+    """
+    @return: the edit distances of the found label to all the candidates, an int array
+    """
+    return np.fromiter((label_distance(found, candidate) for candidate in candidates), dtype=int, count=len(candidates))
+
+def best_match(found, candidates):
+    """
+    @param candidates: the expected labels, a sequence
+    @return: the candidate nearest to the found label by edit distance, the first one on ties
+    """
+    return candidates[int(np.argmin(label_distances(found, candidates)))]
+
+def tier_confusions(answer_tier, student_tier):
+    """
+    Interval labels are paired along the alignment of the two tiers, a substituted label with the label it replaces;
+    points are compared as multisets, as their order follows the pitch contour.
+    A found label left unpaired is paired with its best match among the missing labels, or among all the labels of the answer tier;
+    an added label named like a label of the answer is counted as EXTRA_LABEL
+    @return: a Counter of (expected label, found label) -> count, the correct labels included
+    """
+    expected_names = tier_label_names(answer_tier)
+    found_names = tier_label_names(student_tier)
+    confusions = collections.Counter()
+    edits = align_tiers(answer_tier, student_tier) if answer_tier.classid == INTERVALTIER else None
+    if edits != None:
+        missing = [edit.expected for edit in edits if edit.op == DELETE]
+        unpaired = [edit.found for edit in edits if edit.op == INSERT]
+        confusions.update((edit.expected, edit.found) for edit in edits if edit.op == SUBSTITUTE)
+        correct = collections.Counter(expected_names) - collections.Counter(edit.expected for edit in edits if edit.op != INSERT)
+    else:
+        missing, unpaired = _count_label_mismatches(expected_names, found_names)
+        correct = collections.Counter(expected_names) - collections.Counter(missing)
+    confusions.update({(name, name): count for name, count in correct.items()})
+    vocabulary = tuple(sorted(set(expected_names)))
+    left = collections.Counter(missing)
+    for found in unpaired:
+        candidates = tuple(sorted(+left)) if len(+left) > 0 else vocabulary
+        if len(candidates) == 0 or (len(+left) == 0 and found in vocabulary):
+            confusions[(EXTRA_LABEL, found)] += 1
+            continue
+        expected = best_match(found, candidates)
+        confusions[(expected, found)] += 1
+        left[expected] -= 1
+    confusions.update((expected, MISSING_LABEL) for expected in (+left).elements())
+    return confusions
+
+def collection_confusions(student_answer_obj, right_answer_obj):
+    """
+    @return: a Counter of (TextGrid name, tier name, expected label, found label) -> count, over the tiers the student has
+    """
+    student_textgrids = {item.nameid: item for item in student_answer_obj.items if item.classid == TEXTGRID}
+    confusions = collections.Counter()
+    for answer_textgrid in right_answer_obj.items:
+        if answer_textgrid.classid != TEXTGRID or answer_textgrid.nameid not in student_textgrids:
+            continue
+        for answer_tier in graded_tiers(answer_textgrid):
+            student_tier = _find_tier(student_textgrids[answer_textgrid.nameid], answer_tier.classid, answer_tier.nameid)
+            if student_tier == None:
+                continue
+            for (expected, found), count in tier_confusions(answer_tier, student_tier).items():
+                confusions[(answer_textgrid.nameid, answer_tier.nameid, expected, found)] += count
+    return confusions
+
+def _confusions_of_file(task):
+    """
+    Parses one submission and counts its confusions, run in a worker process
+    @param task: (andrew_id, student_answer_path, right_formatting_answer_path)
+    @return: the Counter of collection_confusions, None if the file cannot be parsed
+    """
+    andrew_id, student_answer_path, right_formatting_answer_path = task
+    student_answer_obj = _load_collection_or_none(student_answer_path, andrew_id)
+    if student_answer_obj == None:
+        return None
+    return collection_confusions(student_answer_obj, ANSWER_REGISTRY.load(right_formatting_answer_path).collection)
+
+
+class ConfusionMatrices(object):
+    """
+    The label confusions of a class, one matrix per tier of the answer
+    """
+
+    def __init__(self, confusions, students) -> None:
+        '''
+        @param confusions: a Counter of (TextGrid name, tier name, expected label, found label) -> count
+        @param students: the number of submissions counted
+        '''
+        self.confusions = confusions
+        self.students = students
+
+    def matrix(self, textgrid, tier):
+        """
+        @return: a DataFrame of counts, the expected labels as rows and the found labels as columns
+        """
+        counts = {(expected, found): count for (g, t, expected, found), count in self.confusions.items() if g == textgrid and t == tier}
+        if len(counts) == 0:
+            return pd.DataFrame()
+        return pd.Series(counts).unstack(fill_value=0)
+
+    def tiers(self):
+        return sorted(set((textgrid, tier) for textgrid, tier, _, _ in self.confusions))
+
+    def top_confusions(self, limit=TOP_CONFUSIONS):
+        """
+        @return: the most frequent mistakes of the class, (TextGrid name, tier name, expected label, found label, count)
+        """
+        mistakes = [key + (count,) for key, count in self.confusions.items() if key[2] != key[3]]
+        mistakes.sort(key=lambda mistake: (-mistake[4], mistake[:4]))
+        return mistakes[:limit]
+
+    def to_dict(self):
+        tiers = []
+        for textgrid, tier in self.tiers():
+            matrix = self.matrix(textgrid, tier)
+            tiers.append({"textgrid": textgrid,
+                          "tier": tier,
+                          "expected": list(matrix.index),
+                          "found": list(matrix.columns),
+                          "counts": matrix.values.tolist()})
+        return {"students": self.students,
+                "top_confusions": [dict(zip(["textgrid", "tier", "expected", "found", "count"], m)) for m in self.top_confusions()],
+                "tiers": tiers}
+
+
+def confusion_matrices(submission_directory, lab_index, processes=None, andrew_ids=None):
+    """
+    Counts the label confusions of the submissions of the whole class;
+    the students without a parsable submission are left out
+    @return: the ConfusionMatrices
+    """
+    assert os.path.isdir(submission_directory), "Error! {:s} is not a directory of submissions!".format(submission_directory)
+    right_formatting_answer_path = _get_right_formatting_answer_path(lab_index=lab_index)
+    if andrew_ids == None:
+        andrew_ids = _get_student_andrew_id_list()
+    tasks = []
+    for andrew_id in andrew_ids:
+        student_answer_path = _find_submission(submission_directory, andrew_id, lab_index)
+        if student_answer_path != None:
+            tasks.append((andrew_id, student_answer_path, right_formatting_answer_path))
+    confusions = collections.Counter()
+    students = 0
+    for result in _map_submissions(_confusions_of_file, tasks, processes):
+        if result != None:
+            confusions.update(result)
+            students += 1
+    return ConfusionMatrices(confusions, students)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--submission-directory', type=str, required=True, help="Directory with all the submissions of the lab")
+    parser.add_argument('--lab-index', type=int, required=True, help="Which lab the submissions belong to")
+    parser.add_argument('--output', type=str, default="-", help="Path of the JSON report, - for stdout")
+    parser.add_argument('--processes', type=int, default=None, help="Number of worker processes, all the CPUs by default")
+
+    args = parser.parse_args()
+
+    matrices = confusion_matrices(args.submission_directory, args.lab_index, processes=args.processes)
+    output = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        json.dump(matrices.to_dict(), output, indent=1)
+        output.write("\n")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main()
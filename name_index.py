@@ -0,0 +1,92 @@
+from data_models import *
+
+#################################################################
+# Name Index
+# a BK-tree of the names of the TextGrids or tiers of a submission, to suggest the name the student
+# probably meant when an expected one is not found; a query only visits the subtrees the triangle inequality allows
+#################################################################
+
+MAX_SUGGESTIONS = 3
+
+def suggestion_radius(name):
+    """
+    @return: the largest edit distance of a suggestion for the name, about one edit in three characters
+    """
+    return max(1, len(name) // 3)
+
+
+class BKTree(object):
+    """
+    A Burkhard-Keller tree over strings with the edit distance as metric;
+    each node is [name, {distance to the node: child node}]
+    """
+
+    def __init__(self, names=()) -> None:
+        self.root = None
+        self.size = 0
+        for name in names:
+            self.add(name)
+
+    def add(self, name):
+        if self.root == None:
+            self.root = [name, {}]
+            self.size = 1
+            return
+        node = self.root
+        while True:
+            distance = editdistance.eval(name, node[0])
+            if distance == 0:
+                return # already indexed
+            child = node[1].get(distance)
+            if child == None:
+                node[1][distance] = [name, {}]
+                self.size += 1
+                return
+            node = child
+
+    def search(self, name, radius):
+        """
+        @return: the list of (distance, indexed name) within the radius of the name, the nearest first
+        """
+        found = []
+        if self.root == None:
+            return found
+        stack = [self.root]
+        while len(stack) > 0:
+            node_name, children = stack.pop()
+            distance = editdistance.eval(name, node_name)
+            if distance <= radius:
+                found.append((distance, node_name))
+            for child_distance, child in children.items():
+                if distance - radius <= child_distance <= distance + radius:
+                    stack.append(child)
+        found.sort()
+        return found
+
+    def suggest(self, name, radius=None, limit=MAX_SUGGESTIONS):
+        """
+        @return: up to limit of the nearest indexed names other than the name itself, as (distance, name),
+                 all at the same distance, within suggestion_radius by default
+        """
+        if radius == None:
+            radius = suggestion_radius(name)
+        found = [match for match in self.search(name, radius) if match[0] > 0]
+        return [match for match in found if match[0] == found[0][0]][:limit]
+
+
+def did_you_mean(suggestions):
+    """
+    @param suggestions: the list of (distance, name) of BKTree.suggest
+    @return: the hint appended to a not found message, empty if there is no suggestion
+    """
+    if len(suggestions) == 0:
+        return ""
+    return " Did you mean {:s}?".format(" or ".join("\"{:s}\"".format(name) for _, name in suggestions))
+
+def suggestion_details(suggestions):
+    """
+    @return: the suggestions as the details of a FormatError
+    """
+    if len(suggestions) == 0:
+        return None
+    return [{"suggestion": name, "distance": distance} for distance, name in suggestions]
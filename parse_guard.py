@@ -0,0 +1,85 @@
+from data_models import *
+from data_models import _compile, _open_text_buffer
+import multiprocessing
+
+#################################################################
+# Parse Guard
+# bounds the size, the number of entries and the time of parsing an untrusted .Collection
+#################################################################
+
+class ParseGuardError(Exception):
+    """
+    Raised when a file is over the limits of ParseLimits or cannot be parsed
+    """
+
+    def __init__(self, reason) -> None:
+        super().__init__("file too complex or malformed: {:s}".format(reason))
+        self.reason = reason
+
+
+class ParseLimits(object):
+    """
+    The limits applied to a guarded parse
+    """
+
+    def __init__(self, max_bytes=512*1024*1024, max_items=100000, time_budget=60.) -> None:
+        '''
+        @param max_bytes: the maximal size of the converted text file, in bytes
+        @param max_items: the maximal number of entries, counting every item, tier, interval and point
+        @param time_budget: the maximal number of seconds the parsing can take before it is cancelled
+        '''
+        self.max_bytes = max_bytes
+        self.max_items = max_items
+        self.time_budget = time_budget
+
+
+DEFAULT_PARSE_LIMITS = ParseLimits() # applied to the untrusted submissions of the check API unless the caller opts out
+
+
+def _count_items(text):
+    """
+    @return: the number of item, interval and point headers in the text; a linear scan without backtracking
+    """
+    header = _compile("\n +(?:item|intervals|points) \\[\\d+\\]:", text)
+    count = 0
+    for _ in header.finditer(text):
+        count += 1
+    return count
+
+
+def _parse_collection_file(text_path, parse_samples=False):
+    """
+    Parses a converted .txt file in low-memory mode, the entry point of the worker process
+    """
+    with _open_text_buffer(text_path) as text:
+        return Collection(text, keep_text=False, parse_samples=parse_samples)
+
+
+def guarded_parse(text_path, limits, parse_samples=False):
+    """
+    Parses the converted .txt file of an untrusted submission into a Collection.
+    The size and the number of entries are checked in this process first, then the parsing
+    runs in a worker process, which is terminated once the time budget is spent.
+
+    @param text_path: the path of the .txt file converted by Praat
+    @param limits: a ParseLimits
+    @param parse_samples: if True, the samples of the Sounds are kept, see data_models.Collection
+    @return: the Collection object
+    @raise ParseGuardError: if a limit is exceeded or the parsing fails
+    """
+    size = os.path.getsize(text_path)
+    if size > limits.max_bytes:
+        raise ParseGuardError("{:d} bytes exceed the limit of {:d} bytes".format(size, limits.max_bytes))
+    with _open_text_buffer(text_path) as text:
+        num_items = _count_items(text)
+    if num_items > limits.max_items:
+        raise ParseGuardError("{:d} entries exceed the limit of {:d} entries".format(num_items, limits.max_items))
+
+    with multiprocessing.Pool(processes=1) as pool: # leaving the with-statement terminates the worker
+        result = pool.apply_async(_parse_collection_file, (text_path, parse_samples))
+        try:
+            return result.get(timeout=limits.time_budget)
+        except multiprocessing.TimeoutError:
+            raise ParseGuardError("parsing did not finish within {:g} seconds".format(limits.time_budget))
+        except Exception as e:
+            raise ParseGuardError("{:s}: {:s}".format(type(e).__name__, str(e)))
@@ -1,17 +1,37 @@
 from data_models import *
 from utils import _compare, _get_right_formatting_answer_path
+from profiling import MemoryProfiler
+from lab_detection import detect_lab
+import multiprocessing
 
-def precheck_for_student(andrew_id, student_file_path, lab_index):
+def precheck_for_student(andrew_id, student_file_path, lab_index, profile_memory=False):
     """
     Used by SINGLE student for self-prechecking purpose before submitting their submissions
     @param andrew_id
     @param student_file_path: the path of the student's submission, and the file name ends up with .Collection
-    @param lab_indx, int, to locate the corresponding answer_file in the package, which is inaccessible to students
+    @param lab_indx, int, to locate the corresponding answer_file in the package, which is inaccessible to students;
+                     if None, the lab is detected from the names of the TextGrids and tiers of the submission;
+                     if given and the submission has errors, a warning is printed when it looks like another lab
+    @param profile_memory: if True, print the peak and retained memory of each stage of the check
     """
+    assert os.path.isfile(student_file_path), "You should input a valid file path, {:s} cannot be found!".format(student_file_path)
+    assert os.path.isabs(student_file_path), "You should input an absolute file path, {:s} is not satisfied!".format(student_file_path)
+    lab_index_given = lab_index != None
+    if not lab_index_given: # detecting parses the submission once more, only done when the lab is not indicated
+        lab_index, score = detect_lab(student_file_path)
+        if lab_index == None:
+            print("The lab of your submission cannot be detected, please indicate it with --lab-index.")
+            return
+        print("Your submission is detected as Lab{:d}.".format(lab_index))
     right_formatting_answer_path = _get_right_formatting_answer_path(lab_index=lab_index) # get the actual file, not a path
+    profiler = MemoryProfiler() if profile_memory else None
     errors = _compare(andrew_id=andrew_id,
             student_answer_path=student_file_path,
-            right_formatting_answer_path=right_formatting_answer_path)
+            right_formatting_answer_path=right_formatting_answer_path,
+            profiler=profiler)
+    if profiler != None:
+        profiler.stop()
+        print("\n".join(profiler.report()))
     if errors == None:
         print("Congratulations! Your submission is correctly formatted and ready for Canvas!")
         return
@@ -19,21 +39,29 @@ def precheck_for_student(andrew_id, student_file_path, lab_index):
         print("There is at least one formatting error in your submission, please correct:")
         for error in errors:
             print(error)
+        if lab_index_given: # the errors may come from checking against the wrong lab
+            detected_lab_index, score = detect_lab(student_file_path)
+            if detected_lab_index != None and detected_lab_index != lab_index:
+                print("Warning: your submission looks like Lab{:d}, but it is checked against Lab{:d} as indicated by --lab-index.".format(
+                    detected_lab_index, lab_index))
         print("Keep returning to this precheck process until there are no formatting errors before submitting to Canvas!")
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('--andrew-id', type=str, required=True)
     parser.add_argument('--student-file-path', type=str, required=True, help="Absolute path of your answer in your PC")
-    parser.add_argument('--lab-index', type=int, required=True, help="Please indicate which lab you are submitting")    
+    parser.add_argument('--lab-index', type=int, default=None, help="Please indicate which lab you are submitting, detected from your submission if omitted")    
+    parser.add_argument('--profile-memory', action='store_true', help="Print the peak and retained memory of each stage of the check")
     
     args = parser.parse_args()
     
     precheck_for_student(andrew_id=args.andrew_id, 
                          student_file_path=args.student_file_path,
-                         lab_index=args.lab_index)
+                         lab_index=args.lab_index,
+                         profile_memory=args.profile_memory)
     
 if __name__ == "__main__":
+    multiprocessing.freeze_support() # the guarded parse starts worker processes, also from the executables
     main()
     
 
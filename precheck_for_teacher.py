@@ -0,0 +1,239 @@
+from data_models import *
+from data_models import _content_hash
+from utils import _compare_records, _check_file_name, _get_right_formatting_answer_path, _get_student_andrew_id_list, _get_file_name
+from parse_guard import DEFAULT_PARSE_LIMITS
+import student_history
+import sys
+import json
+import glob
+import multiprocessing
+import concurrent.futures
+
+CACHE_FILE_NAME = ".precheck_cache.json" # kept in the submission directory by default
+CACHE_VERSION = 5 # bumped whenever the check reports differently, so that the cached results are not reused
+
+def _find_submission(submission_directory, andrew_id, lab_index):
+    """
+    @return: the path of the .Collection file of the student for the lab in the directory, or None;
+             "<andrew_id>_Lab<lab_index>.Collection" if it exists, otherwise the first other file of the student naming the lab,
+             e.g. "<andrew_id>_Lab<lab_index> (1).Collection"
+    """
+    expected_path = os.path.join(submission_directory, "{:s}_Lab{:d}.Collection".format(andrew_id, lab_index))
+    if os.path.isfile(expected_path):
+        return os.path.abspath(expected_path)
+    lab_name = re.compile(r"Lab{:d}(?!\d)".format(lab_index), re.IGNORECASE)
+    paths = sorted(glob.glob(os.path.join(glob.escape(submission_directory), "{:s}_*.Collection".format(glob.escape(andrew_id)))))
+    paths = [path for path in paths if lab_name.search(os.path.basename(path)[len(andrew_id) + 1:]) != None]
+    if len(paths) == 0:
+        return None
+    return os.path.abspath(paths[0])
+
+def _load_cache(cache_path):
+    """
+    @return: the cached content results, cache key -> content result, empty if there is no cache yet
+    """
+    if cache_path == None or not os.path.isfile(cache_path):
+        return {}
+    with open(cache_path) as f:
+        return json.load(f)
+
+def _save_cache(cache, cache_path):
+    """
+    Writes the cache to a temporary file first, so that an interrupted run never leaves a broken cache behind
+    """
+    if cache_path == None:
+        return
+    tmp_path = cache_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(cache, f)
+    os.replace(tmp_path, cache_path)
+
+def _grade_content(task):
+    """
+    Checks the content of one distinct submission, run in a worker process; the file name is checked per copy
+    @param task: (cache key, andrew_id, student_answer_path, right_formatting_answer_path, max_errors, fail_fast, grade, check_sound,
+                  parse_limits)
+    @return: (cache key, content result), the content result is a JSON-serializable dictionary
+    """
+    key, andrew_id, student_answer_path, right_formatting_answer_path, max_errors, fail_fast, grade, check_sound, parse_limits = task
+    try:
+        summary = {}
+        errors = _compare_records(andrew_id, student_answer_path, right_formatting_answer_path, parse_limits=parse_limits,
+                                  max_errors=max_errors, fail_fast=fail_fast, summary=summary, check_file_name=False, grade=grade,
+                                  check_sound=check_sound)
+    except Exception as e:  # a broken submission should not stop the whole class
+        return key, {"failed": True, "mistake_group": None,
+                     "errors": [{"code": "check_failed", "message": "{:s}: {:s}".format(type(e).__name__, str(e))}]}
+    return key, {"failed": False, "mistake_group": summary["mistake_signature"], "errors": [error.to_dict() for error in errors],
+                 "grades": summary.get("grades")}
+
+def _student_result(andrew_id, lab_index, student_answer_path, right_formatting_answer_path, content_result):
+    """
+    Combines the content result shared by identical submissions with the file name check of this copy
+    @return: the result of the student as a JSON-serializable dictionary
+    """
+    result = {"andrew_id": andrew_id, "lab": lab_index, "file": None, "status": "missing", "mistake_group": None, "errors": []}
+    if student_answer_path == None:
+        return result
+    result["file"] = _get_file_name(student_answer_path)
+    errors = list(content_result["errors"])
+    if content_result["failed"]:
+        result["status"] = "failed"
+    else:
+        error_collection_name = _check_file_name(andrew_id, result["file"], _get_file_name(right_formatting_answer_path))
+        if error_collection_name != None:
+            errors.insert(0, error_collection_name.to_dict())
+        result["status"] = "errors" if len(errors) > 0 else "ok"
+    result["mistake_group"] = content_result["mistake_group"] # students with the same group made identical mistakes
+    result["errors"] = errors
+    if content_result.get("grades") != None:
+        result["grades"] = content_result["grades"]
+    return result
+
+def _write_result(result, output, per_error=False):
+    """
+    Writes the result of one student as one JSON line, or one JSON line per error if per_error
+    """
+    if not per_error:
+        output.write(json.dumps(result) + "\n")
+    elif len(result["errors"]) == 0:
+        output.write(json.dumps({"andrew_id": result["andrew_id"], "lab": result["lab"], "file": result["file"],
+                                 "status": result["status"], "error": None}) + "\n")
+    else:
+        for error in result["errors"]:
+            output.write(json.dumps({"andrew_id": result["andrew_id"], "lab": result["lab"], "file": result["file"],
+                                     "status": result["status"], "error": error}) + "\n")
+    output.flush()
+
+def precheck_for_teacher(submission_directory, lab_index, output, processes=None, per_error=False, andrew_ids=None,
+                         max_errors=None, fail_fast=False, cache_path=None, grade=False, history=None, term="", check_sound=False,
+                         parse_limits=None):
+    """
+    Used by the teacher to check the format of the submissions of the whole class
+    Identical submissions (resubmissions, shared group files) are found by content hash and checked only once,
+    the file name is still checked for every copy. The content results are kept in a cache across runs,
+    keyed by the hashes of the submission and of the answer, so a re-run only checks the new or changed files.
+    The results are written to a JSONL stream as soon as each worker finishes, in the order of completion
+
+    @param submission_directory: the directory with the submissions, named "<andrew_id>_Lab<lab_index>.Collection"
+    @param lab_index: int, to locate the corresponding answer_file in the package
+    @param output: a writable text stream for the JSONL results
+    @param processes: the number of worker processes, all the CPUs by default, 1 to check in this process
+    @param per_error: if True, write one line per error instead of one line per student
+    @param andrew_ids: the students to check, STUDENT_ANDREW_ID_LIST by default
+    @param max_errors, fail_fast: bound the errors of each submission, see format_errors.ErrorCollector;
+                                  the file name error of a copy comes on top of max_errors
+    @param cache_path: the JSON file caching the results across runs, None to check everything again
+    @param grade: if True, the boundaries are also graded against the answer and its "-error-bound" tolerances
+    @param history: a connection to the student history (see student_history.py), the results of the lab are added to it at the end
+    @param term: the term of the submissions in the history
+    @param check_sound: if True, the TextGrids are also checked against the Sounds of each submission, see sound_checks.py
+    @param parse_limits: an optional parse_guard.ParseLimits, each submission is then parsed in a bounded worker process
+                         and reported as file_too_complex if it is over the limits
+    @return: the number of students checked
+    """
+    assert os.path.isdir(submission_directory), "Error! {:s} is not a directory of submissions!".format(submission_directory)
+    right_formatting_answer_path = _get_right_formatting_answer_path(lab_index=lab_index)
+    if andrew_ids == None:
+        andrew_ids = _get_student_andrew_id_list()
+    answer_hash = _content_hash(right_formatting_answer_path)
+    cache = _load_cache(cache_path)
+    results = []
+
+    def emit(result):
+        results.append(result)
+        _write_result(result, output, per_error)
+
+    # group the students by the content of their submissions, one task per distinct uncached content
+    copies = {} # cache key -> [(andrew_id, student_answer_path)]
+    tasks = []
+    for andrew_id in andrew_ids:
+        student_answer_path = _find_submission(submission_directory, andrew_id, lab_index)
+        if student_answer_path == None:
+            emit(_student_result(andrew_id, lab_index, None, right_formatting_answer_path, None))
+            continue
+        limits = None if parse_limits == None else [parse_limits.max_bytes, parse_limits.max_items, parse_limits.time_budget]
+        key = json.dumps([CACHE_VERSION, _content_hash(student_answer_path), answer_hash, max_errors, fail_fast, grade, check_sound, limits])
+        if key not in copies:
+            copies[key] = []
+            if key not in cache:
+                tasks.append((key, andrew_id, student_answer_path, right_formatting_answer_path, max_errors, fail_fast, grade, check_sound,
+                              parse_limits))
+        copies[key].append((andrew_id, student_answer_path))
+
+    def write_copies(key, content_result):
+        for andrew_id, student_answer_path in copies[key]:
+            emit(_student_result(andrew_id, lab_index, student_answer_path, right_formatting_answer_path, content_result))
+
+    def record(key, content_result):
+        if not content_result["failed"]: # a failed check may succeed on the next run
+            cache[key] = content_result
+        write_copies(key, content_result)
+
+    for key in copies:
+        if key in cache:
+            write_copies(key, cache[key])
+    try:
+        if processes == 1:
+            for task in tasks:
+                record(*_grade_content(task))
+        elif len(tasks) > 0:
+            # not a multiprocessing.Pool: its daemonic workers cannot start the worker process of a guarded parse
+            with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as executor:
+                for future in concurrent.futures.as_completed([executor.submit(_grade_content, task) for task in tasks]):
+                    record(*future.result())
+    finally:
+        _save_cache(cache, cache_path)
+    if history != None:
+        student_history.record_lab(history, results, term=term)
+    return len(andrew_ids)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--submission-directory', type=str, required=True, help="Directory with all the submissions of the lab")
+    parser.add_argument('--lab-index', type=int, required=True, help="Which lab the submissions belong to")
+    parser.add_argument('--output', type=str, default="-", help="Path of the JSONL results, - for stdout")
+    parser.add_argument('--processes', type=int, default=None, help="Number of worker processes, all the CPUs by default")
+    parser.add_argument('--per-error', action='store_true', help="Write one JSON line per error instead of one per student")
+    parser.add_argument('--max-errors', type=int, default=None, help="Maximal number of errors reported per student")
+    parser.add_argument('--fail-fast', action='store_true', help="Stop checking a student at the first error that prevents grading")
+    parser.add_argument('--cache-path', type=str, default=None,
+                        help="JSON file caching the results across runs, {:s} in the submission directory by default".format(CACHE_FILE_NAME))
+    parser.add_argument('--grade', action='store_true', help="Also grade the boundaries against the tolerances of the answer")
+    parser.add_argument('--check-sound', action='store_true', help="Also check the TextGrids against the Sounds of the submissions")
+    parser.add_argument('--no-cache', action='store_true', help="Check every submission again, without reading or writing the cache")
+    parser.add_argument('--history', type=str, default=None, help="SQLite file of the student history the results of the lab are added to")
+    parser.add_argument('--term', type=str, default="", help="The term of the submissions in the history, e.g. S24")
+    parser.add_argument('--guard-parse', action='store_true',
+                        help="Parse each submission in a bounded worker process, reporting the ones over the default parse limits as too complex")
+
+    args = parser.parse_args()
+
+    cache_path = None
+    if not args.no_cache:
+        cache_path = args.cache_path if args.cache_path != None else os.path.join(args.submission_directory, CACHE_FILE_NAME)
+    history = student_history.connect(args.history) if args.history != None else None
+    output = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        precheck_for_teacher(submission_directory=args.submission_directory,
+                             lab_index=args.lab_index,
+                             output=output,
+                             processes=args.processes,
+                             per_error=args.per_error,
+                             max_errors=args.max_errors,
+                             fail_fast=args.fail_fast,
+                             cache_path=cache_path,
+                             grade=args.grade,
+                             history=history,
+                             term=args.term,
+                             check_sound=args.check_sound,
+                             parse_limits=DEFAULT_PARSE_LIMITS if args.guard_parse else None)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        if history != None:
+            history.close()
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main()
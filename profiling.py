@@ -0,0 +1,157 @@
+import sys
+import tracemalloc
+import contextlib
+import numpy as np
+
+#################################################################
+# Memory Profiler
+# opt-in, used by _compare and Collection to report the memory of each stage
+#################################################################
+
+class StageRecord(object):
+    """
+    Memory statistics of one named stage, accumulated over every time the stage is entered
+    """
+
+    def __init__(self, name) -> None:
+        '''
+        @param name: the name of the stage, e.g. "parse student"
+        @param calls: how many times the stage has been entered
+        @param peak: the highest traced memory reached inside the stage, in bytes, relative to its start
+        @param retained: the traced memory still allocated when the stage exits, in bytes, relative to its start
+        @param by_type: the retained bytes of the attributed objects, grouped by their type name
+        '''
+        self.name = name
+        self.calls = 0
+        self.peak = 0
+        self.retained = 0
+        self.by_type = {}
+
+    def __repr__(self):
+        return "<StageRecord \"{:s}\" calls={:d} peak={:s} retained={:s}>".format(
+            self.name, self.calls, _format_bytes(self.peak), _format_bytes(self.retained))
+
+
+class MemoryProfiler(object):
+    """
+    Takes tracemalloc measurements around named stages of the pipeline.
+    Stages with the same name are merged, so per-item stages inside Collection
+    report the total retained memory and the largest single peak.
+    """
+
+    def __init__(self) -> None:
+        self.stages = {}    # stage name -> StageRecord, in the order of first entry
+        self.total_peak = 0
+        self._started_tracing = False
+        self._active = []   # [StageRecord, absolute peak] of the stages entered and not exited yet, innermost last
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def stop(self):
+        self.total_peak = max(self.total_peak, tracemalloc.get_traced_memory()[1])
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """
+        Measures the peak and retained memory of the code within the with-statement
+        Stages can be nested: the peak of a nested stage is passed up to the stages around it when it exits,
+        and the peak reached before it entered is kept by the enclosing stage, as entering resets the tracemalloc peak
+        @param name: the stage name under which the measurement is accumulated
+        """
+        self.start()
+        record = self.stages.setdefault(name, StageRecord(name))
+        before, before_peak = tracemalloc.get_traced_memory()
+        self.total_peak = max(self.total_peak, before_peak)
+        if len(self._active) > 0:
+            self._active[-1][1] = max(self._active[-1][1], before_peak)
+        if hasattr(tracemalloc, "reset_peak"):  # python >= 3.9, otherwise the peak is the highest since tracing started
+            tracemalloc.reset_peak()
+        active = [record, before] # the stage and the highest absolute traced memory seen in it so far
+        self._active.append(active)
+        try:
+            yield record
+        finally:
+            after, peak = tracemalloc.get_traced_memory()
+            self.total_peak = max(self.total_peak, peak)
+            peak = max(peak, active[1])
+            self._active.pop()
+            if len(self._active) > 0:
+                self._active[-1][1] = max(self._active[-1][1], peak)
+            record.calls += 1
+            record.peak = max(record.peak, peak - before)
+            record.retained += after - before
+
+    def attribute(self, name, obj):
+        """
+        Adds the retained size of obj, grouped by object type, to the stage named name
+        """
+        record = self.stages.setdefault(name, StageRecord(name))
+        for type_name, size in sizeof_by_type(obj).items():
+            record.by_type[type_name] = record.by_type.get(type_name, 0) + size
+
+    def report(self, top_types=5):
+        """
+        @return: a list of printable lines, one per stage followed by its largest object types
+        """
+        lines = ["Memory profile (peak / retained per stage):"]
+        for record in self.stages.values():
+            lines.append("  {:s}: calls {:d}, peak {:s}, retained {:s}".format(
+                record.name, record.calls, _format_bytes(record.peak), _format_bytes(record.retained)))
+            by_type = sorted(record.by_type.items(), key=lambda x: x[1], reverse=True)
+            for type_name, size in by_type[:top_types]:
+                lines.append("      {:s}: {:s}".format(type_name, _format_bytes(size)))
+        lines.append("  overall peak: {:s}".format(_format_bytes(self.total_peak)))
+        return lines
+
+
+def profile_stage(profiler, name):
+    """
+    @return: the stage context of the profiler, or a no-op context when profiling is off
+    """
+    if profiler is None:
+        return contextlib.nullcontext()
+    return profiler.stage(name)
+
+
+def sizeof_by_type(obj):
+    """
+    Walks the object graph reachable from obj (instance attributes and containers)
+    and sums sys.getsizeof of every distinct object, grouped by its type name.
+    numpy arrays are counted with their data buffer.
+    """
+    sizes = {}
+    seen = set()
+    stack = [obj]
+    while len(stack) > 0:
+        current = stack.pop()
+        if id(current) in seen or isinstance(current, type):
+            continue
+        seen.add(id(current))
+        type_name = type(current).__name__
+        if isinstance(current, np.ndarray):
+            size = current.nbytes + sys.getsizeof(np.empty(0))
+        else:
+            size = sys.getsizeof(current)
+        sizes[type_name] = sizes.get(type_name, 0) + size
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend(current)
+        elif hasattr(current, "__dict__"):
+            stack.append(current.__dict__)
+    return sizes
+
+
+def _format_bytes(size):
+    for unit in ["B", "KB", "MB"]:
+        if abs(size) < 1024:
+            return "{:.1f}{:s}".format(size, unit)
+        size /= 1024.
+    return "{:.1f}GB".format(size)
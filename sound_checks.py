@@ -0,0 +1,90 @@
+from data_models import *
+from format_errors import *
+from structure_checks import MAX_DETAILS
+
+#################################################################
+# Sound Checks
+# the TextGrids of a submission checked against the Sound 2 of the same name: the samples must cover the TextGrid,
+# and every interval boundary should sit near a change of the short-time energy; numpy over the whole signal at once
+#################################################################
+
+FRAME_STEP = 0.005 # seconds between the energy frames
+FRAME_WINDOW = 0.02 # seconds of signal in each energy frame, also the lag of the energy change
+CHANGE_THRESHOLD = 6. # dB, the smallest energy change taken as a change point
+MAX_CHANGE_DISTANCE = 0.05 # seconds, a boundary farther than this from any change point is flagged
+SILENCE_ENERGY = 1e-10 # added to the energy before the log, the floor of the silence
+
+def sample_span(sound):
+    """
+    @return: (start, end) of the time covered by the samples, each sample covering dx around its time
+    """
+    return sound.x1 - sound.dx / 2, sound.x1 + (sound.nx - 0.5) * sound.dx
+
+def energy_change_points(sound):
+    """
+    The short-time energy is computed every FRAME_STEP from the cumulative sum of the squared samples (the channels averaged),
+    its change is the difference in dB across FRAME_WINDOW, and the change points are the local maxima of the change above CHANGE_THRESHOLD
+    @return: the times of the change points, sorted
+    """
+    signal = sound.z.mean(axis=0)
+    cumulative = np.concatenate([[0.], np.cumsum(signal * signal)])
+    times = np.arange(sound.xmin, sound.xmax, FRAME_STEP)
+    lag = int(round(FRAME_WINDOW / FRAME_STEP))
+    if len(times) <= 2 * lag + 2:
+        return times[:0]
+    low = np.clip(np.round((times - FRAME_WINDOW / 2 - sound.x1) / sound.dx).astype(int), 0, sound.nx)
+    high = np.clip(np.round((times + FRAME_WINDOW / 2 - sound.x1) / sound.dx).astype(int) + 1, 0, sound.nx)
+    energy = (cumulative[high] - cumulative[low]) / np.maximum(high - low, 1)
+    db = 10 * np.log10(energy + SILENCE_ENERGY)
+    change = np.abs(db[2 * lag:] - db[:-2 * lag])
+    change_times = times[lag:-lag]
+    peaks = (change[1:-1] >= change[:-2]) & (change[1:-1] > change[2:]) & (change[1:-1] >= CHANGE_THRESHOLD)
+    return change_times[1:-1][peaks]
+
+def sound_span_errors(sound, textgrid):
+    """
+    @return: the list of FormatError if the samples of the Sound do not cover the span of the TextGrid
+    """
+    start, end = sample_span(sound)
+    if start <= textgrid.xmin + sound.dx and end >= textgrid.xmax - sound.dx:
+        return []
+    error_span = "The samples of the Sound named {:s} span ({:.3f}s, {:.3f}s) but TextGrid file named {:s} spans ({:.3f}s, {:.3f}s)".format(
+        sound.nameid, start, end, textgrid.nameid, textgrid.xmin, textgrid.xmax)
+    return [FormatError(SOUND_SPAN_MISMATCH, error_span, textgrid.nameid, expected=[textgrid.xmin, textgrid.xmax], found=[start, end])]
+
+def boundary_change_errors(sound, textgrid, change_points=None):
+    """
+    @param change_points: the energy_change_points of the Sound, computed if not given
+    @return: the list of FormatError of the interval tiers whose boundaries are far from every energy change point
+    """
+    if change_points is None:
+        change_points = energy_change_points(sound)
+    errors = []
+    for tier in textgrid.tiers:
+        if tier.classid != INTERVALTIER or len(tier.tier_labels) < 2:
+            continue
+        boundaries = tier.times()[1:, 0]
+        _, distances = nearest_sorted(change_points, boundaries)
+        far = np.flatnonzero(distances > MAX_CHANGE_DISTANCE) # NaN compares False, no change point flags nothing
+        if len(far) == 0:
+            continue
+        error_far = "{:d} boundaries (the first one at {:.3f}s) are more than {:.0f}ms away from any change of energy of the Sound in Interval Tier named {:s} of TextGrid file named {:s}".format(
+            len(far), boundaries[far[0]], MAX_CHANGE_DISTANCE * 1000, tier.nameid, textgrid.nameid)
+        errors.append(FormatError(BOUNDARY_FAR_FROM_CHANGE, error_far, textgrid.nameid, tier.nameid,
+                                  expected=MAX_CHANGE_DISTANCE, count=len(far),
+                                  details=[{"time": float(boundaries[i]), "distance": float(distances[i])} for i in far[:MAX_DETAILS]]))
+    return errors
+
+def collect_sound_errors(collection, collector, textgrid_names=None):
+    """
+    Adds the errors of the TextGrids of the Collection against the Sounds of the same name to the collector;
+    the TextGrids without a Sound are not checked
+    @param textgrid_names: only check the TextGrids with these names, e.g. the ones of the answer; all if None
+    @raise ErrorLimitReached: see format_errors.ErrorCollector.add
+    """
+    sounds = {item.nameid: item for item in collection.items if item.classid == SOUND}
+    for item in collection.items:
+        if item.classid != TEXTGRID or item.nameid not in sounds or (textgrid_names != None and item.nameid not in textgrid_names):
+            continue
+        for error in sound_span_errors(sounds[item.nameid], item) + boundary_change_errors(sounds[item.nameid], item):
+            collector.add(error)
@@ -0,0 +1,101 @@
+from data_models import *
+from format_errors import *
+
+#################################################################
+# Structure Checks
+# the time structure of the tiers of a submission, checked with numpy over the boundary arrays of each tier;
+# independent of the answer, and not covered by the label fingerprint
+#################################################################
+
+BOUNDARY_TOLERANCE = 1e-9 # seconds, Praat writes the shared boundaries with the same digits
+MAX_DETAILS = 20 # the offending times reported per tier
+
+def _details(times):
+    """
+    @return: the first MAX_DETAILS offending times as JSON-serializable floats
+    """
+    return [float(t) for t in np.asarray(times)[:MAX_DETAILS]]
+
+def interval_tier_errors(tier, textgrid):
+    """
+    @param tier: an IntervalTier
+    @param textgrid: the TextGrid of the tier
+    @return: the list of FormatError of the tier: gaps or overlaps between consecutive intervals,
+             and a first or last boundary different from the start or end of the tier
+    """
+    errors = []
+    times = tier.times()
+    if len(times) == 0:
+        return errors
+    gaps = np.flatnonzero(np.abs(times[1:, 0] - times[:-1, 1]) > BOUNDARY_TOLERANCE)
+    if len(gaps) > 0:
+        error_not_contiguous = "The intervals are not contiguous at {:d} boundaries (the first one at {:.3f}s) in Interval Tier named {:s} of TextGrid file named {:s}".format(
+            len(gaps), times[gaps[0], 1], tier.nameid, textgrid.nameid)
+        errors.append(FormatError(INTERVALS_NOT_CONTIGUOUS, error_not_contiguous, textgrid.nameid, tier.nameid,
+                                  count=len(gaps), details=_details(times[gaps, 1])))
+    bounds = np.array([times[0, 0], times[-1, 1]])
+    if np.any(np.abs(bounds - [tier.xmin, tier.xmax]) > BOUNDARY_TOLERANCE):
+        error_bounds = "The intervals span ({:.3f}s, {:.3f}s) but Interval Tier named {:s} of TextGrid file named {:s} spans ({:.3f}s, {:.3f}s)".format(
+            bounds[0], bounds[1], tier.nameid, textgrid.nameid, tier.xmin, tier.xmax)
+        errors.append(FormatError(TIER_BOUNDS_MISMATCH, error_bounds, textgrid.nameid, tier.nameid,
+                                  expected=[tier.xmin, tier.xmax], found=_details(bounds)))
+    return errors
+
+def text_tier_errors(tier, textgrid):
+    """
+    @param tier: a TextTier
+    @param textgrid: the TextGrid of the tier
+    @return: the list of FormatError of the tier: points outside the span of the tier, and points at the same time
+    """
+    errors = []
+    times = tier.times()
+    if len(times) == 0:
+        return errors
+    outside = times[(times < tier.xmin - BOUNDARY_TOLERANCE) | (times > tier.xmax + BOUNDARY_TOLERANCE)]
+    if len(outside) > 0:
+        error_out_of_span = "{:d} points are outside the time span ({:.3f}s, {:.3f}s) of Point Tier named {:s} of TextGrid file named {:s}".format(
+            len(outside), tier.xmin, tier.xmax, tier.nameid, textgrid.nameid)
+        errors.append(FormatError(POINT_OUT_OF_SPAN, error_out_of_span, textgrid.nameid, tier.nameid,
+                                  expected=[tier.xmin, tier.xmax], count=len(outside), details=_details(outside)))
+    sorted_times = np.sort(times)
+    duplicated = sorted_times[1:][np.diff(sorted_times) <= BOUNDARY_TOLERANCE]
+    if len(duplicated) > 0:
+        error_duplicated = "{:d} points are duplicated (the first one at {:.3f}s) in Point Tier named {:s} of TextGrid file named {:s}".format(
+            len(duplicated), duplicated[0], tier.nameid, textgrid.nameid)
+        errors.append(FormatError(POINT_DUPLICATED, error_duplicated, textgrid.nameid, tier.nameid,
+                                  count=len(duplicated), details=_details(duplicated)))
+    return errors
+
+def textgrid_errors(textgrid):
+    """
+    @return: the list of FormatError of the TextGrid: tiers not spanning the TextGrid, and the errors of each tier
+    """
+    errors = []
+    if len(textgrid.tiers) == 0:
+        return errors
+    spans = np.array([(tier.xmin, tier.xmax) for tier in textgrid.tiers], dtype=float)
+    mismatched = np.flatnonzero(np.any(np.abs(spans - [textgrid.xmin, textgrid.xmax]) > BOUNDARY_TOLERANCE, axis=1))
+    for i in mismatched:
+        tier = textgrid.tiers[i]
+        error_span = "Tier named {:s} spans ({:.3f}s, {:.3f}s) but TextGrid file named {:s} spans ({:.3f}s, {:.3f}s)".format(
+            tier.nameid, tier.xmin, tier.xmax, textgrid.nameid, textgrid.xmin, textgrid.xmax)
+        errors.append(FormatError(TIER_SPAN_MISMATCH, error_span, textgrid.nameid, tier.nameid,
+                                  expected=[textgrid.xmin, textgrid.xmax], found=[tier.xmin, tier.xmax]))
+    for tier in textgrid.tiers:
+        if tier.classid == INTERVALTIER:
+            errors.extend(interval_tier_errors(tier, textgrid))
+        else:
+            errors.extend(text_tier_errors(tier, textgrid))
+    return errors
+
+def collect_structure_errors(collection, collector, textgrid_names=None):
+    """
+    Adds the structure errors of the TextGrids of the Collection to the collector
+    @param textgrid_names: only check the TextGrids with these names, e.g. the ones of the answer; all if None
+    @raise ErrorLimitReached: see format_errors.ErrorCollector.add
+    """
+    for item in collection.items:
+        if item.classid != TEXTGRID or (textgrid_names != None and item.nameid not in textgrid_names):
+            continue
+        for error in textgrid_errors(item):
+            collector.add(error)
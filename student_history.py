@@ -0,0 +1,122 @@
+from data_models import *
+from format_errors import ERRORS_TRUNCATED
+import sqlite3
+
+#################################################################
+# Student History
+# the results of every lab checked by the batch grader, one row per student and lab,
+# so that the error trends of a student can be followed across labs and terms
+#################################################################
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS lab_results (
+    andrew_id TEXT NOT NULL,
+    lab INTEGER NOT NULL,
+    term TEXT NOT NULL,
+    checked_at TEXT NOT NULL,
+    file TEXT,
+    status TEXT NOT NULL,
+    error_count INTEGER NOT NULL,
+    PRIMARY KEY (andrew_id, lab, term)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS lab_errors (
+    andrew_id TEXT NOT NULL,
+    lab INTEGER NOT NULL,
+    term TEXT NOT NULL,
+    code TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (andrew_id, lab, term, code)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS lab_results_lab ON lab_results(lab, term);
+CREATE INDEX IF NOT EXISTS lab_errors_code ON lab_errors(code, lab);
+"""
+
+def connect(history_path):
+    """
+    @return: a connection to the history database, with the tables created if needed;
+             it can be the same file as the database of ingest.py
+    """
+    connection = sqlite3.connect(history_path)
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.executescript(SCHEMA)
+    return connection
+
+def error_counts(errors):
+    """
+    @param errors: the errors of a result of the batch grader, as dictionaries with a "code"
+    @return: code -> the number of errors, the truncation notice is not counted
+    """
+    counts = {}
+    for error in errors:
+        if error["code"] == ERRORS_TRUNCATED:
+            continue
+        counts[error["code"]] = counts.get(error["code"], 0) + error.get("count", 1)
+    return counts
+
+def record_lab(connection, results, term="", checked_at=None):
+    """
+    Adds the results of one run of the batch grader to the history in one transaction;
+    the rows of a student for a lab and term checked before are replaced, the other labs are left as they are
+    @param results: the results of precheck_for_teacher, dictionaries with andrew_id, lab, file, status and errors
+    @param term: the term of the lab, e.g. S24, so that a lab of each term is kept apart
+    @return: the number of students recorded
+    """
+    if checked_at == None:
+        checked_at = datetime.datetime.now().isoformat(timespec="seconds")
+    result_rows, error_rows = [], []
+    for result in results:
+        counts = error_counts(result["errors"])
+        key = (result["andrew_id"], result["lab"], term)
+        result_rows.append(key + (checked_at, result["file"], result["status"], sum(counts.values())))
+        error_rows.extend(key + (code, count) for code, count in counts.items())
+    with connection:
+        connection.executemany("DELETE FROM lab_errors WHERE andrew_id = ? AND lab = ? AND term = ?", [row[:3] for row in result_rows])
+        connection.executemany("INSERT OR REPLACE INTO lab_results VALUES (?, ?, ?, ?, ?, ?, ?)", result_rows)
+        connection.executemany("INSERT INTO lab_errors VALUES (?, ?, ?, ?, ?)", error_rows)
+    return len(result_rows)
+
+TERM_STARTS = "SELECT term, MIN(checked_at) AS term_start FROM lab_results GROUP BY term" # the terms in the order they were checked
+
+def error_counts_by_code(connection, andrew_id=None):
+    """
+    @param andrew_id: only the errors of this student, all the students by default
+    @return: the list of (term, lab, code, number of errors, number of students with the error), in the order of the labs;
+             the terms are in the order of their first check, as their names (e.g. F24, S25) do not sort in time
+    """
+    query = ("SELECT e.term, e.lab, e.code, SUM(e.count), COUNT(*) FROM lab_errors e"
+             " JOIN (" + TERM_STARTS + ") t ON t.term = e.term")
+    parameters = []
+    if andrew_id != None:
+        query += " WHERE e.andrew_id = ?"
+        parameters.append(andrew_id)
+    query += " GROUP BY e.term, e.lab, e.code ORDER BY MIN(t.term_start), e.lab, SUM(e.count) DESC"
+    return connection.execute(query, parameters).fetchall()
+
+def rising_students(connection, min_labs=2, term=None):
+    """
+    Finds the students whose number of errors grows across the labs, by the least-squares slope of their error counts
+    over the rank of each lab among the labs of the class, the terms in the order of their first check and the labs of a term by index
+    The labs a student did not submit are left out, since their errors are unknown
+    @param min_labs: the students with fewer submitted labs are left out
+    @return: the list of (andrew_id, slope in errors per lab, number of labs, errors of the last lab), the steepest first
+    """
+    query = ("WITH ranked AS ("
+             " SELECT h.andrew_id, h.status, h.error_count, DENSE_RANK() OVER (ORDER BY t.term_start, h.lab) AS x"
+             " FROM lab_results h JOIN (" + TERM_STARTS + ") t ON t.term = h.term{:s}),"
+             " submitted AS (SELECT * FROM ranked WHERE status != 'missing')"
+             " SELECT andrew_id, n, (n * sxy - sx * sy) / (n * sxx - sx * sx), last_errors FROM ("
+             " SELECT andrew_id, COUNT(*) AS n, SUM(x * 1.0) AS sx, SUM(error_count * 1.0) AS sy,"
+             " SUM(x * x * 1.0) AS sxx, SUM(x * error_count * 1.0) AS sxy,"
+             " (SELECT r.error_count FROM submitted r WHERE r.andrew_id = s.andrew_id ORDER BY r.x DESC LIMIT 1) AS last_errors"
+             " FROM submitted s GROUP BY andrew_id)"
+             " WHERE n >= ? AND n * sxx > sx * sx")
+    parameters = []
+    if term != None:
+        query = query.format(" WHERE h.term = ?")
+        parameters.append(term)
+    else:
+        query = query.format("")
+    rows = connection.execute(query, parameters + [min_labs]).fetchall()
+    rising = [(andrew_id, slope, n, last_errors) for andrew_id, n, slope, last_errors in rows if slope > 0]
+    rising.sort(key=lambda row: -row[1])
+    return rising
@@ -0,0 +1,50 @@
+import os
+import sys
+import random
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PACKAGE_DIR)
+
+from alignment import diff_sequences, _pair_substitutions, EQUAL, INSERT, DELETE, SUBSTITUTE
+
+def _lcs_length(a, b):
+    lengths = [[0] * (len(b) + 1) for _ in range(len(a) + 1)]
+    for i in range(len(a)):
+        for j in range(len(b)):
+            lengths[i + 1][j + 1] = lengths[i][j] + 1 if a[i] == b[j] else max(lengths[i][j + 1], lengths[i + 1][j])
+    return lengths[-1][-1]
+
+def _edits(script):
+    return sum(1 for op, _, _ in script if op != EQUAL)
+
+def test_script_is_shortest_and_rebuilds_both_sequences():
+    rng = random.Random(0)
+    for _ in range(200):
+        a = [rng.choice("abc") for _ in range(rng.randint(0, 12))]
+        b = [rng.choice("abc") for _ in range(rng.randint(0, 12))]
+        script = diff_sequences(a, b)
+        assert [a[i] for op, i, _ in script if op != INSERT] == a
+        assert [b[j] for op, _, j in script if op != DELETE] == b
+        assert all(a[i] == b[j] for op, i, j in script if op == EQUAL)
+        assert _edits(script) == len(a) + len(b) - 2 * _lcs_length(a, b)
+
+def test_identical_and_empty_sequences():
+    assert diff_sequences([], []) == []
+    assert diff_sequences(list("ab"), list("ab")) == [(EQUAL, 0, 0), (EQUAL, 1, 1)]
+    assert diff_sequences([], list("ab")) == [(INSERT, 0, 0), (INSERT, 0, 1)]
+    assert diff_sequences(list("ab"), []) == [(DELETE, 0, 0), (DELETE, 1, 0)]
+
+def test_substitutions_are_paired_between_equal_labels():
+    assert _pair_substitutions(diff_sequences(list("axyb"), list("azb"))) == [(SUBSTITUTE, 1, 1), (DELETE, 2, None)]
+    assert _pair_substitutions(diff_sequences(list("axb"), list("azwb"))) == [(SUBSTITUTE, 1, 1), (INSERT, None, 2)]
+    assert _pair_substitutions(diff_sequences(list("ab"), list("ba"))) in ([(DELETE, 0, None), (INSERT, None, 1)],
+                                                                          [(INSERT, None, 0), (DELETE, 1, None)])
+    assert _pair_substitutions(diff_sequences(list("axb"), list("ayb"))) == [(SUBSTITUTE, 1, 1)]
+    assert _pair_substitutions(diff_sequences(list("ab"), list("ab"))) == []
+
+def test_max_edits_cuts_off():
+    a, b = list("abcd"), list("wxyz")
+    assert diff_sequences(a, b, max_edits=7) == None
+    assert _edits(diff_sequences(a, b, max_edits=8)) == 8
+    assert diff_sequences(a, a, max_edits=0) == [(EQUAL, i, i) for i in range(4)]
+    assert diff_sequences(a, a[:3], max_edits=0) == None
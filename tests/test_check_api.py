@@ -0,0 +1,36 @@
+import os
+import sys
+import parselmouth as pm
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PACKAGE_DIR)
+
+from check_api import check_bytes, _is_text_collection
+from parse_guard import ParseLimits
+from format_errors import FILE_TOO_COMPLEX
+
+JIAQI1 = os.path.join(PACKAGE_DIR, "test_files", "jiaqi1_Lab3.Collection")
+JIAQI1_CODES = ["interval_count_mismatch", "point_name_mismatch"]
+
+def _saved_as(tmp_path, save):
+    path = str(tmp_path / "jiaqi1_Lab3.Collection")
+    save(pm.read(JIAQI1), path)
+    with open(path, "rb") as f:
+        return f.read()
+
+def test_long_text_is_parsed_directly(tmp_path):
+    data = _saved_as(tmp_path, lambda obj, path: obj.save_as_text_file(path))
+    assert _is_text_collection(data)
+    assert [e.code for e in check_bytes("jiaqi1", "jiaqi1_Lab3.Collection", data, 3)] == JIAQI1_CODES
+
+def test_short_text_is_converted(tmp_path):
+    data = _saved_as(tmp_path, lambda obj, path: obj.save_as_short_text_file(path))
+    assert not _is_text_collection(data)
+    assert [e.code for e in check_bytes("jiaqi1", "jiaqi1_Lab3.Collection", data, 3)] == JIAQI1_CODES
+
+def test_over_budget_file_is_too_complex(tmp_path):
+    data = _saved_as(tmp_path, lambda obj, path: obj.save_as_text_file(path))
+    for limits in [ParseLimits(max_items=10), ParseLimits(max_bytes=1024)]:
+        assert [e.code for e in check_bytes("jiaqi1", "jiaqi1_Lab3.Collection", data, 3, parse_limits=limits)] == [FILE_TOO_COMPLEX]
+    binary = _saved_as(tmp_path, lambda obj, path: obj.save(path))
+    assert [e.code for e in check_bytes("jiaqi1", "jiaqi1_Lab3.Collection", binary, 3, parse_limits=ParseLimits(max_items=10))] == [FILE_TOO_COMPLEX]
@@ -0,0 +1,34 @@
+import os
+import sys
+import numpy as np
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PACKAGE_DIR)
+
+from consensus_answer import _majority_labels, _align_points
+
+def test_majority_label_wins():
+    assert _majority_labels([["a", "x"], ["b", "x"], ["b", "y"]]) == ["b", "x"]
+
+def test_tie_goes_to_the_earliest_sequence():
+    assert _majority_labels([["b", "y"], ["a", "x"]]) == ["b", "y"]
+    assert _majority_labels([["a", "x"], ["b", "y"]]) == ["a", "x"]
+    # "z" is first at position 1 but only once, "x" and "y" tie and "y" comes first
+    assert _majority_labels([["c", "z"], ["c", "y"], ["a", "x"], ["a", "x"], ["b", "y"]]) == ["c", "y"]
+
+def test_points_are_aligned_by_name_and_time():
+    events = [(["H", "L"], np.array([0.1, 0.5]), np.array([1., 2.])),
+              (["L", "H"], np.array([0.4, 0.2]), np.array([3., 4.])),
+              (["H", "H", "L"], np.array([0.3, 0.15, 0.6]), np.array([5., 6., 7.]))]
+    labels, times, values = _align_points(events)
+    assert labels == ["H", "L"]
+    np.testing.assert_array_equal(times, [[0.1, 0.5], [0.2, 0.4], [0.15, 0.6]])
+    np.testing.assert_array_equal(values, [[1., 2.], [4., 3.], [6., 7.]])
+
+def test_missing_points_are_nan():
+    events = [(["H", "H"], np.array([0.1, 0.2]), np.array([1., 2.])),
+              (["H", "H"], np.array([0.3, 0.4]), np.array([3., 4.])),
+              (["H"], np.array([0.5]), np.array([5.]))]
+    labels, times, _ = _align_points(events)
+    assert labels == ["H", "H"]
+    np.testing.assert_array_equal(times, [[0.1, 0.2], [0.3, 0.4], [0.5, np.nan]])
@@ -1,11 +1,106 @@
 from data_models import *
+from data_models import _contains, _open_text_buffer
+from profiling import profile_stage
+from parse_guard import guarded_parse, ParseGuardError
+from workspace import Workspace
+from format_errors import *
+from fingerprint import FingerprintTree, mistake_signature
+from answer_registry import ANSWER_REGISTRY
+from alignment import align_tiers, tier_label_names, DELETE, INSERT
+from structure_checks import collect_structure_errors
+from sound_checks import collect_sound_errors
+from grading import grade_collection
+from name_index import BKTree, did_you_mean, suggestion_details
+import collections
+import multiprocessing
 
 def _get_file_name(path):
         path = os.path.split(path)
         return path[-1]
 
+def _check_file_name(andrew_id, student_answer_name, right_formatting_answer_name):
+    """
+    @return: a FormatError if the submission is not named as "<andrew_id>_<name of the answer>", otherwise None
+    """
+    expected_student_answer_name = "{:s}_{:s}".format(andrew_id, right_formatting_answer_name)
+
+    if expected_student_answer_name != student_answer_name:
+        error_collection_name = "Your uploaded file name {:s} does not follow the instructions, please rename it.".format(student_answer_name)
+        return FormatError(FILE_NAME_MISMATCH, error_collection_name, expected=expected_student_answer_name, found=student_answer_name)
+    return None
+
+def _parse_text(text, profiler=None, parse_samples=False):
+    """
+    Parses the text of a .Collection in ooTextFile format, a str or a buffer, in low-memory mode
+    @param parse_samples: if True, the samples of the Sounds are kept, see data_models.Collection
+    @return: (Collection, None), or (None, FormatError) if it is not ooTextFile
+    """
+    if not _contains(text, VALIDFILETYPE):
+        error_ootextfile_type = "Abortion: only ooTextFile file type can be processed! Else file type is detected!"
+        return None, FormatError(FILE_TYPE_INVALID, error_ootextfile_type, expected=VALIDFILETYPE)
+    return Collection(text, profiler=profiler, keep_text=False, parse_samples=parse_samples), None
+
+def _load_collection(collection_path, workspace, name, profiler=None, parse_limits=None, parse_samples=False):
+    """
+    Converts a .Collection file (binary or text) into a .txt file of the workspace with Praat and parses it
+    The converted file is memory-mapped and parsed in place, only names, labels and numbers are copied out
+
+    @param name: the readable part of the name of the converted file
+    @param parse_limits: an optional parse_guard.ParseLimits, the file is parsed in a bounded worker process if given
+    @param parse_samples: if True, the samples of the Sounds are kept, e.g. for the sound checks
+    @return: (Collection, None), or (None, FormatError) if the file cannot be checked
+    """
+    txt_path = workspace.file_path(name)
+    with profile_stage(profiler, "convert to text"):
+        pm.read(collection_path).save_as_text_file(txt_path)
+    return _parse_text_file(txt_path, profiler, parse_limits, parse_samples)
+
+def _parse_text_file(txt_path, profiler=None, parse_limits=None, parse_samples=False):
+    """
+    Parses a .Collection file already in ooTextFile format, memory-mapped
+    @param parse_limits: an optional parse_guard.ParseLimits, the file is parsed in a bounded worker process if given
+    @return: (Collection, None), or (None, FormatError) if the file cannot be checked
+    """
+    with _open_text_buffer(txt_path) as text:
+        if parse_limits == None:
+            return _parse_text(text, profiler, parse_samples)
+        if not _contains(text, VALIDFILETYPE):
+            return _parse_text(text)
+    try:
+        return guarded_parse(txt_path, parse_limits, parse_samples), None
+    except ParseGuardError as e:
+        error_parse_guard = "Abortion: your submission file is too complex or malformed to be checked ({:s})!".format(e.reason)
+        return None, FormatError(FILE_TOO_COMPLEX, error_parse_guard, found=e.reason)
+
+def _load_collection_or_none(collection_path, name, parse_samples=False):
+    """
+    Loads one submission of a batch tool in a workspace of its own
+    @param name: the readable part of the name of the converted file
+    @return: the Collection, or None if the file cannot be parsed, e.g. a corrupt file Praat cannot read
+    """
+    try:
+        with Workspace() as workspace:
+            collection, error = _load_collection(collection_path, workspace, name, parse_samples=parse_samples)
+    except Exception:  # a broken submission is left out, it should not stop the whole class
+        return None
+    return collection
+
+def _map_submissions(function, tasks, processes=None):
+    """
+    Applies the function of a batch tool to every task, in a pool of worker processes
+    @param processes: the number of worker processes, all the CPUs by default, 1 to run in this process
+    @return: an iterator of the results in the order of the tasks, yielded as the workers finish them;
+             the workers are terminated once it is exhausted or closed
+    """
+    if processes == 1:
+        yield from map(function, tasks)
+        return
+    with multiprocessing.Pool(processes=processes) as pool:
+        yield from pool.imap(function, tasks)
+
 # for formatting only
-def _compare(andrew_id, student_answer_path, right_formatting_answer_path, tmp_directory=None):
+def _compare(andrew_id, student_answer_path, right_formatting_answer_path, tmp_directory=None, profiler=None, parse_limits=None,
+             max_errors=None, fail_fast=False):
     """
     Detect format failures of two .Collection files
     Specifically, for all TextGrid in the right answer, 
@@ -16,51 +111,151 @@ def _compare(andrew_id, student_answer_path, right_formatting_answer_path, tmp_d
     @param student_answer_path: the abspath of student submission
     @param right_formatting_answer_path: the relative/internal formatting answer file within the program
     @param tmp_directory: the temporar directory to store the intermediate-stage .txt files
+    @param profiler: an optional profiling.MemoryProfiler, measuring the memory of each stage when given
+    @param parse_limits: an optional parse_guard.ParseLimits; when given, the student submission is parsed in a
+                         worker process bounded by these limits, and an over-limit file is reported as an error
+    @param max_errors: the maximal number of errors to report, the check stops once it is reached; unbounded if None
+    @param fail_fast: if True, the check stops at the first error that prevents grading
+    @return: the list of error messages, or None if there is no error
     """
 
     assert os.path.isfile(student_answer_path), "You should input a valid file path, {:s} cannot be found!".format(student_answer_path)
     assert os.path.isabs(student_answer_path), "You should input an absolute file path, {:s} is not satisfied!".format(student_answer_path)
 
-    errors = []
+    errors = _compare_records(andrew_id, student_answer_path, right_formatting_answer_path, 
+                              tmp_directory=tmp_directory, profiler=profiler, parse_limits=parse_limits,
+                              max_errors=max_errors, fail_fast=fail_fast)
+    if any(error.code == FILE_TYPE_INVALID for error in errors):
+        return NotImplementedError
+    if len(errors) > 0:
+        return [str(error) for error in errors]
+    return None
+
+def _compare_records(andrew_id, student_answer_path, right_formatting_answer_path, tmp_directory=None, profiler=None, parse_limits=None,
+                     student_answer_name=None, max_errors=None, fail_fast=False, summary=None, check_file_name=True, grade=False,
+                     check_sound=False):
+    """
+    The same check as _compare, returning structured records
+
+    @param student_answer_name: the name the submission was uploaded with, the file name of student_answer_path by default
+    @param max_errors, fail_fast: bound the collected errors, see format_errors.ErrorCollector
+    @param summary: an optional dictionary, filled with the "mistake_signature" of the submission (see fingerprint.mistake_signature)
+    @param check_file_name: if False, only the content is checked, e.g. when the grader checks the name of each copy itself
+    @param grade: if True, the summary is also filled with the "grades" of the boundaries (see grading.grade_collection)
+    @param check_sound: if True, the TextGrids are also checked against the Sounds of the submission (see sound_checks)
+    @return: the list of FormatError, empty if there is no error
+    """
+
+    if summary != None:
+        summary["mistake_signature"] = None
+    collector = ErrorCollector(max_errors=max_errors, fail_fast=fail_fast)
     # First, to detect if there is any file name's mismatching error 
-    student_answer_name = _get_file_name(student_answer_path)
+    if student_answer_name == None:
+        student_answer_name = _get_file_name(student_answer_path)
     right_formatting_answer_name = _get_file_name(right_formatting_answer_path)
-    
-    expected_student_answer_name = "{:s}_{:s}".format(andrew_id, right_formatting_answer_name)
-
-    if expected_student_answer_name != student_answer_name:
-        error_collection_name = "Your uploaded file name {:s} does not follow the instructions, please rename it.".format(student_answer_name)
-        errors.append(error_collection_name)
-        
+    error_collection_name = _check_file_name(andrew_id, student_answer_name, right_formatting_answer_name)
+    if check_file_name and error_collection_name != None:
+        collector.add(error_collection_name) # never fatal, and max_errors is at least 1
 
     # Second, convert both .Collection files into .txt and read both as Collection objects
-    if tmp_directory == None:   # if the tmp_directory is not given, then it means the portal that calls this function is precheck_for_student,
-                                # otherwise, the precheck_for_teacher will explicitly provide a directory to make sure all the intermediate files are stored in one directory
-        datestr = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
-        tmp_directory = os.path.join(os.path.abspath("."), ("Precheck_for_student_" + datestr))
-        assert not os.path.isdir(tmp_directory), "Something went wrong, {:s} has been taken!".format(tmp_directory)
-        os.mkdir(tmp_directory)
-
-    student_txt_path = tmp_directory +  "/" + andrew_id + ".txt" 
-    answer_txt_path = tmp_directory + "/" + "answer.txt"
-    pm.read(student_answer_path).save_as_text_file(student_txt_path)
-    pm.read(right_formatting_answer_path).save_as_text_file(answer_txt_path)
-    student_answer_txt = open(student_txt_path).read()
-    right_answer_txt = open(answer_txt_path).read()
-    os.remove(answer_txt_path)
-    os.remove(student_txt_path)
+    # if the tmp_directory is not given, then it means the portal that calls this function is precheck_for_student, and a unique
+    # workspace is created (on tmpfs when available) and removed for this call; otherwise, the precheck_for_teacher explicitly provides
+    # a directory to make sure all the intermediate files are stored in one directory
+    with Workspace(tmp_directory) as workspace:
+        with profile_stage(profiler, "parse student"):
+            student_answer_obj, error_student = _load_collection(student_answer_path, workspace, andrew_id, profiler, parse_limits,
+                                                                   parse_samples=check_sound)
+    if error_student != None:
+        collector.errors.append(error_student)
+        return collector.errors
+    with profile_stage(profiler, "parse answer"):
+        answer = ANSWER_REGISTRY.load(right_formatting_answer_path) # parsed once per process, until the file changes
+    right_answer_obj, answer_tree = answer.collection, answer.tree
+    student_tree = FingerprintTree(student_answer_obj)
+    if profiler != None:
+        profiler.attribute("parse student", student_answer_obj)
+        profiler.attribute("parse answer", right_answer_obj)
 
-    try:
-        tmp1 = student_answer_txt.index("ooTextFile")
-        tmp2 = right_answer_txt.index("ooTextFile")
-    except:
-        error_ootextfile_type = "Abortion: only ooTextFile file type can be processed! Else file type is detected!"
-        errors.append(error_ootextfile_type)
-        return NotImplementedError
-    student_answer_obj = Collection(student_answer_txt)
-    right_answer_obj = Collection(right_answer_txt)
+    if summary != None:
+        summary["mistake_signature"] = mistake_signature(answer_tree, student_tree)
+        if grade:
+            with profile_stage(profiler, "grade"):
+                summary["grades"] = [g.to_dict() for g in grade_collection(student_answer_obj, right_answer_obj)]
 
     # Thirdly, follow the order of the TextGrid files in right answer, check the possible format errors of student answer
+    with profile_stage(profiler, "compare"):
+        return _compare_collections(student_answer_obj, right_answer_obj, collector, student_tree, answer_tree, check_sound=check_sound)
+
+def _compare_collections(student_answer_obj, right_answer_obj, collector=None, student_tree=None, answer_tree=None, check_sound=False):
+    """
+    Follow the order of the TextGrid files in right answer, check the possible format errors of student answer
+    The time structure of the TextGrids of the answer is checked first (see structure_checks), then the labels;
+    the TextGrids and tiers whose fingerprint matches the answer are skipped, only the differing ones are walked
+    @param collector: the ErrorCollector bounding the errors, unbounded by default
+    @param student_tree, answer_tree: the fingerprint.FingerprintTree of both Collections, built if not given
+    @param check_sound: if True, the TextGrids are finally checked against the Sounds of the submission (see sound_checks)
+    @return: the list of FormatError
+    """
+
+    if collector == None:
+        collector = ErrorCollector()
+    if student_tree == None:
+        student_tree = FingerprintTree(student_answer_obj)
+    if answer_tree == None:
+        answer_tree = FingerprintTree(right_answer_obj)
+    try:
+        textgrid_names = set(node.name for node in answer_tree.root.children)
+        collect_structure_errors(student_answer_obj, collector, textgrid_names)
+        if student_tree.digest != answer_tree.digest: # fast path: the same labels as the answer
+            _collect_format_errors(student_answer_obj, right_answer_obj, collector, student_tree, answer_tree)
+        if check_sound:
+            collect_sound_errors(student_answer_obj, collector, textgrid_names)
+    except ErrorLimitReached:
+        pass
+    return collector.finish()
+
+def _count_label_mismatches(expected_labels, found_labels):
+    """
+    Compares the two lists of label names as multisets
+    @return: (the expected labels not found, the found labels not expected), both sorted
+    """
+    expected_counter = collections.Counter(expected_labels)
+    found_counter = collections.Counter(found_labels)
+    missing = sorted((expected_counter - found_counter).elements())
+    unexpected = sorted((found_counter - expected_counter).elements())
+    return missing, unexpected
+
+def _align_label_mismatches(answer_tier, student_tier):
+    """
+    Aligns the ordered labels of the two tiers, so that a swapped, inserted or deleted interval is reported once, where it is
+    @return: (the expected labels not matched, the found labels not matched, the edits as dictionaries);
+             if the tiers are too different to align, the labels are compared as multisets and there are no edits
+    """
+    edits = align_tiers(answer_tier, student_tier)
+    if edits == None:
+        missing, unexpected = _count_label_mismatches(tier_label_names(answer_tier), tier_label_names(student_tier))
+        return missing, unexpected, None
+    missing = [edit.expected for edit in edits if edit.op != INSERT]
+    unexpected = [edit.found for edit in edits if edit.op != DELETE]
+    return missing, unexpected, [edit.to_dict() for edit in edits]
+
+def _suggest_name(name_indexes, key, name, names):
+    """
+    Suggests the names the student probably meant, the BK-tree of the names is only built for the first name not found
+    @param name_indexes: the BK-trees built so far, key -> BKTree
+    @param names: the names of the student indexed under the key
+    @return: the list of (distance, name) of BKTree.suggest
+    """
+    if key not in name_indexes:
+        name_indexes[key] = BKTree(names)
+    return name_indexes[key].suggest(name)
+
+def _collect_format_errors(student_answer_obj, right_answer_obj, collector, student_tree, answer_tree):
+    """
+    The walk of _compare_collections, adding every FormatError to the collector
+    """
+    name_indexes = {} # the BK-trees of the student names, built when a name is not found
+
     for item in right_answer_obj.items:
         if item.classid == TEXTGRID:
             textgrid = item
@@ -68,6 +263,8 @@ def _compare(andrew_id, student_answer_path, right_formatting_answer_path, tmp_d
             for student_item in student_answer_obj.items:
                 if student_item.classid == TEXTGRID and student_item.nameid == textgrid.nameid:
                     matched_textgrid = student_item
+                    if student_tree.digest_of(matched_textgrid) == answer_tree.digest_of(textgrid):
+                        continue # identical subtree, no error in its tiers
                     for tier in textgrid.tiers:
                         if tier.classid == INTERVALTIER:
                             interval = tier
@@ -75,30 +272,37 @@ def _compare(andrew_id, student_answer_path, right_formatting_answer_path, tmp_d
                             for student_tier in matched_textgrid.tiers:
                                 if student_tier.classid == INTERVALTIER and student_tier.nameid == interval.nameid:
                                     matched_tier = student_tier
+                                    if student_tree.digest_of(matched_tier) == answer_tree.digest_of(interval):
+                                        continue
                                     if len(interval.tier_labels) != len(matched_tier.tier_labels):
                                         error_num_interval_mismatch = "There are {:d} intervals detected; {:d} are expected in Interval Tier named {:s} in TextGrid file named {:s}".format(
                                                   len(matched_tier.tier_labels)-2,
                                                   len(interval.tier_labels)-2,
                                                   interval.nameid,
                                                   textgrid.nameid)
-                                        errors.append(error_num_interval_mismatch)
+                                        _, _, details = _align_label_mismatches(interval, matched_tier)
+                                        collector.add(FormatError(INTERVAL_COUNT_MISMATCH, error_num_interval_mismatch, textgrid.nameid, interval.nameid,
+                                                                  expected=len(interval.tier_labels)-2, found=len(matched_tier.tier_labels)-2, details=details))
                                         
                                     else:
                                         interval_labels_nameid = [l[2] for l in interval.tier_labels]
-                                        interval_labels_nameid.sort()
-                                        matched_tier_labels_nameid = [l[2] for l in matched_tier.tier_labels]
-                                        matched_tier_labels_nameid.sort()
-                                        for i in range(len(interval.tier_labels)):
-                                            if interval_labels_nameid[i] != matched_tier_labels_nameid[i]:
-                                                error_name_interval_mismatch = "The name of the Interval Tier does not follow instructions (mismatched) in Interval Tier named {:s} of TextGrid file named {:s}".format(
-                                                          interval.nameid,
-                                                          textgrid.nameid
-                                                      )
-                                                errors.append(error_name_interval_mismatch)
+                                        missing, unexpected, details = _align_label_mismatches(interval, matched_tier)
+                                        if len(missing) > 0:
+                                            error_name_interval_mismatch = "The name of the Interval Tier does not follow instructions (mismatched) in Interval Tier named {:s} of TextGrid file named {:s} ({:d} of {:d} labels mismatched)".format(
+                                                      interval.nameid,
+                                                      textgrid.nameid,
+                                                      len(missing),
+                                                      len(interval_labels_nameid)
+                                                  )
+                                            collector.add(FormatError(INTERVAL_NAME_MISMATCH, error_name_interval_mismatch, textgrid.nameid, interval.nameid,
+                                                                      expected=missing, found=unexpected, count=len(missing), details=details))
                                                 
                             if matched_tier == None:
+                                suggestions = _suggest_name(name_indexes, (id(matched_textgrid), INTERVALTIER), interval.nameid,
+                                                            [t.nameid for t in matched_textgrid.tiers if t.classid == INTERVALTIER])
                                 error_interval_tier_not_found = "Interval Tier named {:s} not found in TextGrid file named {:s}!".format(interval.nameid, matched_textgrid.nameid)
-                                errors.append(error_interval_tier_not_found)
+                                collector.add(FormatError(INTERVAL_TIER_NOT_FOUND, error_interval_tier_not_found + did_you_mean(suggestions), matched_textgrid.nameid, interval.nameid,
+                                                          expected=interval.nameid, details=suggestion_details(suggestions)))
                                     
                                 
                         else: 
@@ -111,41 +315,47 @@ def _compare(andrew_id, student_answer_path, right_formatting_answer_path, tmp_d
                                 for student_tier in matched_textgrid.tiers:
                                     if student_tier.classid == TEXTTIER and student_tier.nameid == point.nameid:
                                         matched_tier = student_tier
+                                        if student_tree.digest_of(matched_tier) == answer_tree.digest_of(point):
+                                            continue
                                         if len(point.tier_labels) != len(matched_tier.tier_labels):
                                             error_num_point_mismatch = "There are {:d} points detected; {:d} are expected in Point Tier named {:s} in TextGrid file named {:s}".format( 
                                                     len(matched_tier.tier_labels),
                                                     len(point.tier_labels),
                                                     point.nameid,
                                                     textgrid.nameid)
-                                            errors.append(error_num_point_mismatch)
+                                            _, _, details = _align_label_mismatches(point, matched_tier)
+                                            collector.add(FormatError(POINT_COUNT_MISMATCH, error_num_point_mismatch, textgrid.nameid, point.nameid,
+                                                                      expected=len(point.tier_labels), found=len(matched_tier.tier_labels), details=details))
                                             
                                         else:
                                             point_labels_nameid = [l[1].split("=")[0].strip() for l in point.tier_labels]
-                                            point_labels_nameid.sort()
                                             matched_tier_labels_nameid = [l[1].split("=")[0].strip() for l in matched_tier.tier_labels]
-                                            matched_tier_labels_nameid.sort()
-                                            for i in range(len(point.tier_labels)):
-                                                if point_labels_nameid[i] != matched_tier_labels_nameid[i]:
-                                                    error_name_point_mismatch = "The name of the Point Tier does not follow instructions (mismatched) in Point Tier named {:s} of TextGrid file named {:s}".format(
-                                                            point.nameid,
-                                                            textgrid.nameid
-                                                        )
-                                                    errors.append(error_name_point_mismatch)
+                                            # the order of the points follows the pitch contour of each recording, only their names are checked
+                                            missing, unexpected = _count_label_mismatches(point_labels_nameid, matched_tier_labels_nameid)
+                                            if len(missing) > 0:
+                                                _, _, details = _align_label_mismatches(point, matched_tier)
+                                                error_name_point_mismatch = "The name of the Point Tier does not follow instructions (mismatched) in Point Tier named {:s} of TextGrid file named {:s} ({:d} of {:d} labels mismatched)".format(
+                                                        point.nameid,
+                                                        textgrid.nameid,
+                                                        len(missing),
+                                                        len(point_labels_nameid)
+                                                    )
+                                                collector.add(FormatError(POINT_NAME_MISMATCH, error_name_point_mismatch, textgrid.nameid, point.nameid,
+                                                                          expected=missing, found=unexpected, count=len(missing), details=details))
                                                     
                                 if matched_tier == None:
+                                    suggestions = _suggest_name(name_indexes, (id(matched_textgrid), TEXTTIER), point.nameid,
+                                                                [t.nameid for t in matched_textgrid.tiers if t.classid == TEXTTIER])
                                     error_point_tier_not_found = "Point Tier named {:s} is not found in TextGrid file named {:s}!".format(point.nameid, matched_textgrid.nameid)
-                                    errors.append(error_point_tier_not_found)
+                                    collector.add(FormatError(POINT_TIER_NOT_FOUND, error_point_tier_not_found + did_you_mean(suggestions), matched_textgrid.nameid, point.nameid,
+                                                              expected=point.nameid, details=suggestion_details(suggestions)))
                                                                       
             if matched_textgrid == None:
+                suggestions = _suggest_name(name_indexes, TEXTGRID, item.nameid,
+                                            [i.nameid for i in student_answer_obj.items if i.classid == TEXTGRID])
                 error_textgrid_not_found = "TextGrid file named {:s} not found!".format(item.nameid)
-                errors.append(error_textgrid_not_found)
-    
-    if tmp_directory.__contains__("for_student"):
-        os.removedirs(tmp_directory)
-
-    if len(errors) > 0:
-        return errors
-    return None
+                collector.add(FormatError(TEXTGRID_NOT_FOUND, error_textgrid_not_found + did_you_mean(suggestions), item.nameid, expected=item.nameid,
+                                          details=suggestion_details(suggestions)))
 
 
 def _get_right_answer_path(lab_index):
@@ -159,16 +369,13 @@ def _get_right_answer_path(lab_index):
         
     return right_answer_path
 
-def _get_right_formatting_answer_path(lab_index):
+def _get_right_formatting_answer_path(lab_index, course=None, term=None):
     """
     Get the relative path of the right answer within the executible program, compiled in advance, and not accessible for users 
     The name of the right answer corresponding to the lab_index x should contains a substring of "Labx"
+    @param course, term: locate the answer of another course and term, see answer_registry.AnswerRegistry
     """
-    assert type(lab_index) == int, "You need to input an integer to identify which Lab your submission belongs to!"
-    right_formatting_answer_path = "{:s}/formatting_answers/Lab{:d}.Collection".format(BASE_DIR, lab_index)
-    assert os.path.isfile(right_formatting_answer_path), "Error! There is an error when locating the right answer {:s}, the program now is in {:s}".format(right_answer_path, BASE_DIR) 
-        
-    return right_formatting_answer_path
+    return ANSWER_REGISTRY.answer_path(lab_index, course, term)
 
 def _get_student_andrew_id_list():
     return STUDENT_ANDREW_ID_LIST
@@ -184,6 +391,7 @@ def _tier_obj_dict_to_textgrid(tier_obj_dict, directory, max_tier=3):
     @param max_tier: the maximal number of tiers contains in one textgrid file, the answer tier is not counted and will always show on the top of the textgrid file
     """
     assert os.path.isdir(directory), "Error! Please provide a valid directory to save the generated segmentation answers, {:s} should be replaced!".format(directory)
+    # the raw tier text is needed to write the files, so the tiers cannot be parsed with keep_text=False
 
     for textgrid_name, tg_dict in tier_obj_dict.items():
         for tier_name, tier_list in tg_dict.items(): 
@@ -0,0 +1,69 @@
+import os
+import shutil
+import tempfile
+
+#################################################################
+# Workspace
+# scratch space for the intermediate .txt files converted by Praat
+#################################################################
+
+TMPFS_DIR = "/dev/shm" # memory-backed file system on Linux, the converted files never touch the disk there
+
+def _default_parent_directory():
+    """
+    @return: the tmpfs directory if it is available and writable, otherwise the system temporary directory
+    """
+    if os.path.isdir(TMPFS_DIR) and os.access(TMPFS_DIR, os.W_OK):
+        return TMPFS_DIR
+    return tempfile.gettempdir()
+
+
+class Workspace(object):
+    """
+    A scratch directory for one check, safe to use by parallel checks in the same process or directory.
+    Praat can only convert files on a path, so the files live on tmpfs when it is available.
+    """
+
+    def __init__(self, directory=None, prefix="Precheck_for_student_") -> None:
+        '''
+        @param directory: an existing directory to put the files in, e.g. the tmp_directory given by the grader,
+                          it is kept on cleanup; if None, a unique directory is created and removed on cleanup
+        @param prefix: the prefix of the created directory
+        '''
+        if directory == None:
+            self.path = tempfile.mkdtemp(prefix=prefix, dir=_default_parent_directory())
+            self.owns_directory = True
+        else:
+            assert os.path.isdir(directory), "Error! The workspace directory {:s} does not exist!".format(directory)
+            self.path = directory
+            self.owns_directory = False
+        self.files = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.cleanup()
+
+    def file_path(self, name, suffix=".txt"):
+        """
+        Reserves a file with a unique name in the workspace, so that two checks of the same student do not collide
+        @param name: the readable part of the file name, e.g. the Andrew ID
+        @return: the absolute path of the (empty) file
+        """
+        fd, path = tempfile.mkstemp(prefix=name + "_", suffix=suffix, dir=self.path)
+        os.close(fd)
+        self.files.append(path)
+        return path
+
+    def cleanup(self):
+        """
+        Removes every file reserved in the workspace, and the directory if it was created by the workspace
+        """
+        if self.owns_directory:
+            shutil.rmtree(self.path, ignore_errors=True)
+        else:
+            for path in self.files:
+                if os.path.isfile(path):
+                    os.remove(path)
+        self.files = []